@@ -0,0 +1,186 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+ragu-batch - headless batch processing of radar data files
+applies a processing recipe of garlic methods to each input file across a process pool,
+writing processed data and processing log per file along with a json timing summary
+"""
+### imports ###
+from ragu import radar
+from ragu.ingest import ingest
+from ragu.tools import export, tasks
+import os, sys, ast, glob, json, time, argparse, configparser
+import multiprocessing as mp
+import numpy as np
+
+# garlic processing methods which may be used in a recipe
+steps = ["reverse", "set_tzero", "tzero_shift", "flatten", "unflatten", "vertical_roll", "tpowGain", "filter",
+         "hilbertxform", "removeSlidingMeanFFT", "restack", "dewow", "agcGain"]
+
+# output formats for processed data
+formats = ["npy", "csv"]
+
+
+# read_recipe is a function to read a processing recipe as a list of (method, args, kwargs)
+# a recipe is either a json list of {"method": str, "args": list or dict} entries (a bare method name string is also accepted),
+# or a ragu processing log exported as a python script - rdata.<method>(...) lines are applied, ingest lines are skipped
+def read_recipe(fpath):
+    recipe = []
+    if fpath.endswith(".py"):
+        with open(fpath, "r") as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            call = node.value if isinstance(node, ast.Expr) else None
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and \
+                isinstance(call.func.value, ast.Name) and call.func.value.id == "rdata":
+                recipe.append((call.func.attr,
+                               [ast.literal_eval(arg) for arg in call.args],
+                               {kw.arg: ast.literal_eval(kw.value) for kw in call.keywords}))
+    else:
+        with open(fpath, "r") as f:
+            for step in json.load(f):
+                if isinstance(step, str):
+                    step = {"method": step}
+                args = step.get("args", {})
+                if isinstance(args, dict):
+                    recipe.append((step["method"], [], args))
+                else:
+                    recipe.append((step["method"], list(args), {}))
+
+    for method, args, kwargs in recipe:
+        if method not in steps:
+            raise ValueError("Invalid recipe step: {}\nValid steps: {}".format(method, ", ".join(steps)))
+    return recipe
+
+
+# get_files is a function to list readable radargrams from a directory or glob pattern
+# files are probed by their ingest module, so accompanying navigation, label and clutter simulation files are skipped
+def get_files(path):
+    if os.path.isdir(path):
+        path = os.path.join(path, "*")
+    files = []
+    for f in sorted(glob.glob(path)):
+        if not os.path.isfile(f):
+            continue
+        try:
+            igst = ingest(f)
+        except ValueError:
+            continue
+        if igst.probe():
+            files.append(f)
+    return files
+
+
+# process is a function to ingest a single data file, apply a recipe, and write outputs - run once per pool worker
+def process(fpath, recipe, outdir, fmt, simpath, navcrs, body, precision, cachedir=None, threads=None):
+    start = time.time()
+    out = {"file": fpath}
+    try:
+        radar.set_precision(precision)
+        tasks.set_threads(threads)
+        t = time.time()
+        rdata = ingest(fpath).read(simpath, navcrs, body, cachedir=cachedir)
+        # undo checkpoints are not needed - only hold the current processing state
+        rdata.journal.enabled = False
+        out["ingest"] = time.time() - t
+
+        out["steps"] = []
+        for method, args, kwargs in recipe:
+            t = time.time()
+            getattr(rdata, method)(*args, **kwargs)
+            out["steps"].append({"method": method, "time": time.time() - t})
+
+        t = time.time()
+        fn = os.path.join(outdir, rdata.fn + "_proc")
+        if fmt == "npy":
+            np.save(fn + ".npy", rdata.proc.get_curr_amp())
+        elif fmt == "csv":
+            export.dat(fn + ".csv", rdata.proc.get_curr_amp())
+        export.log(fn + ".py", rdata.hist)
+        out["write"] = time.time() - t
+        out["output"] = fn + "." + fmt
+        out["status"] = "ok"
+
+    except Exception as err:
+        out["status"] = "error"
+        out["error"] = "{}: {}".format(type(err).__name__, err)
+
+    out["time"] = time.time() - start
+    return out
+
+
+def _process(job):
+    return process(*job)
+
+
+def main():
+    # get default configuration file
+    configPath = os.path.join(os.path.expanduser('~'),'RAGU','config.ini')
+
+    # set up CLI
+    parser = argparse.ArgumentParser(
+    description=f"RAGU batch processing - apply a processing recipe to many radar data files\n\nFor documentation see: https://github.com/btobers/RAGU",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    parser.add_argument("input", help="Data directory or glob pattern of data files, e.g. 'data/*.h5'")
+    parser.add_argument("-recipe", help="Processing recipe - json list of steps, or a RAGU processing log (.py)\nValid steps: " + ", ".join(steps), required=True)
+    parser.add_argument("-outPath", help="Output directory (default = config outPath)", default='')
+    parser.add_argument("-format", help="Processed data output format", choices=formats, default="npy")
+    parser.add_argument("-workers", help="Number of worker processes (default = cpu count)", type=int, default=os.cpu_count())
+    parser.add_argument("-configPath", help="Configuration file path", nargs="?", default=configPath)
+    args = parser.parse_args()
+
+    # read config - data file ingest parameters
+    conf = configparser.ConfigParser()
+    conf.read(args.configPath)
+    simpath = conf.get("path", "simPath", fallback="")
+    navcrs = conf.get("nav", "crs", fallback="+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs")
+    body = conf.get("nav", "body", fallback="earth")
+    precision = conf.get("param", "precision", fallback="float64")
+    cachedir = conf.get("path", "cachePath", fallback="") or None
+    outdir = args.outPath or conf.get("path", "outPath", fallback="") or os.getcwd()
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    recipe = read_recipe(args.recipe)
+    files = get_files(args.input)
+    if not files:
+        print(f"No data files found: {args.input}")
+        sys.exit(1)
+    workers = max(1, min(args.workers, len(files)))
+    print(f"Processing {len(files)} files with {workers} workers")
+
+    # each worker holds one garlic object at a time, and is replaced after each file to release its memory
+    # the cpu count is split across workers for threaded processing steps, rather than each worker using every cpu
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.time()
+    results = []
+    jobs = [(f, recipe, outdir, args.format, simpath, navcrs, body, precision, cachedir, threads) for f in files]
+    with mp.Pool(processes=workers, maxtasksperchild=1) as pool:
+        for res in pool.imap_unordered(_process, jobs):
+            results.append(res)
+            print("[{}/{}] {} {} ({:.1f} s)".format(len(results), len(files), res["status"], res["file"], res["time"]))
+            if res["status"] == "error":
+                print("\t" + res["error"])
+
+    # write timing summary
+    summary = {"input": args.input,
+               "recipe": [{"method": m, "args": a, "kwargs": k} for m, a, k in recipe],
+               "format": args.format,
+               "workers": workers,
+               "ok": sum(res["status"] == "ok" for res in results),
+               "failed": sum(res["status"] == "error" for res in results),
+               "time": time.time() - start,
+               "files": sorted(results, key=lambda res: res["file"])}
+    fpath = os.path.join(outdir, "ragu_batch_summary.json")
+    with open(fpath, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Processed {summary['ok']}/{len(files)} files in {summary['time']:.1f} s\nSummary written to: {fpath}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,12 @@ def create_config(fpath):
     config.set('param', 'uid', '')
     config.set('param', '# str cmap: Matplotlib colormap to use (default = seismic)')
     config.set('param', 'cmap', '')
+    config.set('param', '# float undoMem: memory budget for processing undo checkpoints in GB, older checkpoints are spilled to disk (default = 1)')
+    config.set('param', 'undoMem', '1')
+    config.set('param', '# str precision: floating point precision of processed data, float32 halves memory use (float32 or float64, default = float64)')
+    config.set('param', 'precision', 'float64')
+    config.set('param', '# float prefetchMem: memory budget for recently opened and background prefetched data files in GB (default = 2)')
+    config.set('param', 'prefetchMem', '2')
 
     config.add_section('path')
     config.set('path', '# str datPath: path to data files (optional)')
@@ -19,6 +25,8 @@ def create_config(fpath):
     config.set('path', 'mapPath', '')
     config.set('path', '# str outPath: output path (optional)')
     config.set('path', 'outPath', '')
+    config.set('path', '# str cachePath: directory in which to cache ingested data files for fast reopening (optional)')
+    config.set('path', 'cachePath', '')
 
     config.add_section('nav')
     config.set('nav', '# str body: planetary body from which radar data was acquired (earth, moon, mars)')
@@ -7,13 +7,26 @@
 radar data ingest wrapper
 """
 ### imports ###
-from ragu.ingest import ingest_oibAK, ingest_groundhog, ingest_uaf_kentech, ingest_pulseekko, ingest_gssi, ingest_sharad, ingest_marsis, ingest_marsis_ipc, ingest_lrs, ingest_cresis_rds, ingest_cresis_snow, ingest_rimfax
+from ragu.ingest import ingest_oibAK, ingest_groundhog, ingest_uaf_kentech, ingest_pulseekko, ingest_gssi, ingest_sharad, ingest_marsis, ingest_marsis_ipc, ingest_lrs, ingest_cresis_rds, ingest_cresis_snow, ingest_rimfax, diskcache
 from ragu.tools import utils
+from ragu.nav import areoid
 import numpy as np
 import pandas as pd
 import tkinter as tk
 import fnmatch
 
+# ingest modules which may read each ambiguous file type, in order of precedence.
+# each module exposes a probe(fpath) method which inspects only file headers, hdf5 group names, or pds label keys
+# csv, dat and lbl files may also be navigation, clutter simulation or label files accompanying a radargram - lbl files are never read directly
+readers = {
+    "h5": [ingest_oibAK, ingest_groundhog, ingest_uaf_kentech],
+    "mat": [ingest_cresis_snow, ingest_cresis_rds, ingest_oibAK],
+    "img": [ingest_sharad, ingest_lrs, ingest_marsis, ingest_marsis_ipc],
+    "csv": [ingest_rimfax],
+    "dat": [ingest_marsis],
+    "lbl": [],
+}
+
 class ingest:
     # ingest is a class which builds a dictionary holding data and metadata from the file
     def __init__(self, fpath):
@@ -32,39 +45,52 @@ class ingest:
         self.ftype = ftype
 
 
-    def read(self, simpath=None, navcrs='+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs', body='earth'):
+    # probe is a method to check whether the file is a radargram that can be read, without reading its data
+    # unambiguous file types are assumed readable
+    def probe(self):
+        if self.ftype not in readers:
+            return True
+        try:
+            self.sniff()
+        except ValueError:
+            return False
+        return True
+
+
+    # sniff is a method to select the single ingest module able to read the file, using each module's probe method
+    def sniff(self):
+        for module in readers[self.ftype]:
+            if module.probe(self.fpath):
+                return module
+        raise ValueError("Unable to determine data format for file: {}\nNo {} reader recognized the file: {}".format(
+            self.fpath, self.ftype, ", ".join(module.__name__.split(".")[-1] for module in readers[self.ftype])))
+
+
+    def read(self, simpath=None, navcrs='+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs', body='earth', mmap=True, cachedir=None):
         # wrapper method for reading in a file
         # better ways to do this than an if/else
         # but for a few file types this is easier
-        if (self.ftype == "h5"):
+        # mmap: memory map binary radargrams (img/dat) rather than reading them into memory
+        # cachedir: directory of the persistent ingest cache - files are read from the cache once ingested, until the source file changes
+        cached = None
+        if cachedir:
+            # reference rasters sampled during nav parsing are copied under the cache directory rather than read by window
+            areoid.set_cachedir(cachedir)
             try:
-                self.rdata = ingest_oibAK.read_h5(self.fpath, navcrs, body)
-            except:
-                try:
-                    self.rdata = ingest_groundhog.read_h5(self.fpath, navcrs, body)
-                except:
-                    self.rdata = ingest_uaf_kentech.read_h5(self.fpath, navcrs, body)
+                cached = diskcache.load(self.fpath, cachedir, simpath, navcrs, body)
+            except Exception as err:
+                print("Ingest cache read failed for {}: {}".format(self.fpath, err))
+
+        if (cached is not None):
+            self.rdata = cached
+        elif (self.ftype == "h5"):
+            self.rdata = self.sniff().read_h5(self.fpath, navcrs, body)
         elif (self.ftype == "mat"):
-            try:
-                self.rdata = ingest_cresis_snow.read_mat(self.fpath, navcrs, body)
-            except:
-                try:
-                    self.rdata = ingest_cresis_rds.read_mat(self.fpath, navcrs, body)
-                except:
-                    self.rdata = ingest_oibAK.read_mat(self.fpath, navcrs, body)
+            self.rdata = self.sniff().read_mat(self.fpath, navcrs, body)
         elif (self.ftype == "img"):
-            try:
-                self.rdata = ingest_sharad.read(self.fpath, simpath, navcrs, body)
-            except:
-                try:
-                    self.rdata = ingest_lrs.read(self.fpath, simpath, navcrs, body)
-                except:
-                    try:
-                        self.rdata = ingest_marsis.read(self.fpath, simpath, navcrs, body)
-                    except:
-                        self.rdata = ingest_marsis_ipc.read(self.fpath, simpath, navcrs, body)
+            self.rdata = self.sniff().read(self.fpath, simpath, navcrs, body, mmap)
         elif (self.ftype == "dat"):
-            self.rdata = ingest_marsis.read(self.fpath, simpath, navcrs, body)
+            self.rdata = ingest_marsis.read(self.fpath, simpath, navcrs, body, mmap)
         elif (self.ftype == "csv"):
             self.rdata = ingest_rimfax.read(self.fpath, navcrs, body)
         elif (self.ftype == "dt1"):
@@ -79,12 +105,26 @@ class ingest:
             print("File reader for format {} not built yet".format(self.ftype))
             exit(1)
 
+        # cache newly ingested data - radargrams already memory mapped from their source file are read directly
+        if cachedir and (cached is None) and (not isinstance(self.rdata.dat, np.memmap)):
+            try:
+                diskcache.save(self.rdata, cachedir, simpath, navcrs, body)
+            except Exception as err:
+                print("Ingest cache write failed for {}: {}".format(self.fpath, err))
+
+        # back derived data arrays (magnitude, power) with session scratch files rather than memory
+        if cachedir:
+            try:
+                self.rdata.derivedDir = diskcache.scratch(cachedir)
+            except OSError:
+                pass
+
         print("----------------------------------------")
         print("Loaded: " + self.rdata.fn)
 
         # add ingest commands to log
-        self.rdata.log('igst = ingest.ingest("{}")'.format(self.fpath))
-        self.rdata.log('rdata = igst.read("{}","{}","{}")'.format(simpath,navcrs,body))
+        self.rdata.log('igst = ingest.ingest({!r})'.format(self.fpath))
+        self.rdata.log('rdata = igst.read({!r},{!r},{!r},mmap={})'.format(simpath,navcrs,body,mmap))
 
         return self.rdata
 
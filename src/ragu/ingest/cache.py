@@ -0,0 +1,169 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+in-memory cache and background prefetch of ingested radar data files
+"""
+### imports ###
+from ragu.ingest import ingest
+import numpy as np
+import os, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# key returns the cache key of a data file - its path, modification time and ingest parameters
+def key(fpath, simpath=None, navcrs=None, body=None):
+    try:
+        mtime = os.path.getmtime(fpath)
+    except OSError:
+        mtime = None
+    return (fpath, mtime, simpath, navcrs, body)
+
+
+# nbytes returns the memory held by a garlic object's arrays - raw and processed data, dB data and display pyramids,
+# clutter simulation, navigation and in-memory undo checkpoints. memory mapped arrays are backed by their files and not counted
+def nbytes(rdata):
+    arrs = [rdata.dat, rdata.proc.curr_amp, rdata.proc._curr_dB[1], rdata.get_sim_amp(), rdata._sim]
+    arrs += [v[1] for v in rdata._derived.values()]
+    arrs += [cp["amp"] for cp in rdata.journal.checkpoints.values()]
+    arrs += [cp["unflatten"][1] for cp in rdata.journal.checkpoints.values() if "unflatten" in cp]
+    for pyr in [rdata._dPyramid[1], rdata._sPyramid]:
+        if pyr is not None:
+            arrs += list(pyr.levels.values()) + list(pyr.cache.values())
+    total = 0
+    seen = set()
+    for arr in arrs:
+        if isinstance(arr, np.ndarray) and not isinstance(arr, np.memmap) and id(arr) not in seen:
+            seen.add(id(arr))
+            total += arr.nbytes
+    if rdata.navdf is not None:
+        total += int(rdata.navdf.memory_usage(deep=True).sum())
+    return total
+
+
+# release removes the scratch files of an evicted ingest object - derived arrays and spilled undo checkpoints
+def release(igst):
+    rdata = getattr(igst, "rdata", None)
+    if rdata is not None:
+        rdata.clear_derived()
+        rdata.journal.close()
+
+
+class lru(object):
+    """
+    lru holds ingest objects keyed by file path, modification time and ingest parameters.
+    garlic objects are held as they were left, with their processing state and picks.
+    the least recently used are evicted once the arrays of the held garlic objects exceed maxbytes.
+    """
+    def __init__(self, maxbytes=2e9):
+        #: float, bytes of garlic array data to hold
+        self.maxbytes = maxbytes
+        #: OrderedDict, (ingest object, bytes) pairs in least to most recently used order
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+
+    def put(self, key, igst):
+        with self.lock:
+            old = self.items.get(key)
+            if (old is not None) and (old[0] is not igst):
+                release(old[0])
+            self.items[key] = (igst, nbytes(igst.rdata))
+            self.items.move_to_end(key)
+            self.enforce()
+
+
+    # remove and return ingest object - None if not held
+    def take(self, key):
+        with self.lock:
+            item = self.items.pop(key, None)
+        if item is None:
+            return None
+        return item[0]
+
+
+    def nbytes(self):
+        return sum(item[1] for item in self.items.values())
+
+
+    # evict least recently used objects to stay within maxbytes
+    def enforce(self):
+        while self.items and self.nbytes() > self.maxbytes:
+            release(self.items.popitem(last=False)[1][0])
+
+
+    def clear(self):
+        with self.lock:
+            for igst, _ in self.items.values():
+                release(igst)
+            self.items.clear()
+
+
+class prefetcher(object):
+    """
+    prefetcher ingests data files on a worker thread ahead of use, holding finished ingest objects in a memory capped lru.
+    recently opened datasets are put back in the same lru once they are left.
+    """
+    def __init__(self, maxbytes=2e9, workers=1, cachedir=None):
+        #: lru, finished ingest objects
+        self.cache = lru(maxbytes)
+        #: str, persistent ingest cache directory - None to always ingest from the source file
+        self.cachedir = cachedir
+        #: dict, futures of queued and running ingests
+        self.pending = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+
+
+    # queue background ingest of files not already cached or pending
+    def prefetch(self, fpaths, simpath=None, navcrs=None, body=None):
+        for fpath in fpaths:
+            k = key(fpath, simpath, navcrs, body)
+            with self.lock:
+                if (k in self.pending) or (k in self.cache):
+                    continue
+                self.pending[k] = self.pool.submit(self.read, k)
+
+
+    def read(self, k):
+        try:
+            igst = ingest(k[0])
+            igst.read(*k[2:], cachedir=self.cachedir)
+            self.cache.put(k, igst)
+        finally:
+            with self.lock:
+                self.pending.pop(k, None)
+
+
+    # get cached or prefetched ingest object, waiting on its ingest if still running - None if the file was not cached, or failed to ingest
+    def get(self, k):
+        with self.lock:
+            future = self.pending.get(k)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                return None
+        return self.cache.take(k)
+
+
+    # hold an opened ingest object, under the key it was opened with, once it is left
+    def put(self, k, igst):
+        if (k is not None) and (getattr(igst, "rdata", None) is not None):
+            self.cache.put(k, igst)
+
+
+    # cancel queued ingests and drop cached objects
+    def close(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+        self.pool.shutdown(wait=False)
+        self.cache.clear()
@@ -0,0 +1,163 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+persistent on-disk cache of ingested radar data files
+"""
+### imports ###
+from ragu import radar
+from ragu.radar import garlic
+from ragu.ingest.ingest_pulseekko import TraceHeaders
+import numpy as np
+import pandas as pd
+import os, json, shutil, hashlib, tempfile, threading, atexit
+
+# cache layout version - entries written by another version are re-ingested
+version = 2
+
+# session scratch directory for derived arrays
+_session = None
+_lock = threading.Lock()
+
+# garlic scalar attributes held in the manifest
+scalars = ["fn", "dtype", "snum", "tnum", "dt", "fs", "prf", "nchan", "truncs", "geocrs", "xyzcrs", "dbit"]
+
+
+# entry returns the cache directory of a data file for a set of ingest parameters
+def entry(cachedir, fpath, simpath=None, navcrs=None, body=None):
+    cachedir = os.path.expanduser(cachedir)
+    fpath = os.path.abspath(fpath)
+    h = hashlib.sha1(json.dumps([fpath, simpath, navcrs, body, radar.precision]).encode()).hexdigest()[:12]
+    return os.path.join(cachedir, "{}_{}".format(os.path.splitext(os.path.basename(fpath))[0], h))
+
+
+# scratch returns this session's scratch directory under the cache directory, creating it on first use - derived data arrays are memory mapped here
+# it is kept apart from cache entries, which are replaced when a source file changes, and removed when the process exits
+def scratch(cachedir):
+    global _session
+    with _lock:
+        if _session is None:
+            root = os.path.join(os.path.expanduser(cachedir), "scratch")
+            os.makedirs(root, exist_ok=True)
+            _session = tempfile.mkdtemp(prefix="session_", dir=root)
+            atexit.register(shutil.rmtree, _session, True)
+        return _session
+
+
+# stamp returns the manifest fields used to validate a cache entry - source file size and modification time, ingest parameters and session precision
+def stamp(fpath, simpath=None, navcrs=None, body=None):
+    st = os.stat(fpath)
+    return {"version": version,
+            "fpath": os.path.abspath(fpath),
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "simpath": simpath,
+            "navcrs": navcrs,
+            "body": body,
+            "precision": radar.precision}
+
+
+# json encoder fallback for numpy scalars and arrays in garlic info
+def _tojson(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, bytes):
+        return obj.decode(errors="replace")
+    raise TypeError("{} is not json serializable".format(type(obj).__name__))
+
+
+# save writes the freshly ingested garlic core to a cache entry - arrays as .npy files, everything else in a json manifest
+def save(rdata, cachedir, simpath=None, navcrs=None, body=None):
+    path = entry(cachedir, rdata.fpath, simpath, navcrs, body)
+    manifest = stamp(rdata.fpath, simpath, navcrs, body)
+    # the manifest is written last, so an interrupted write leaves an entry which is never read
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    def put(name, arr):
+        np.save(os.path.join(path, name + ".npy"), np.asarray(arr), allow_pickle=False)
+        return name
+
+    manifest["attrs"] = {attr: getattr(rdata, attr) for attr in scalars}
+    manifest["info"] = rdata.info
+    manifest["flags"] = {"sampzero": rdata.flags.sampzero, "sim": rdata.flags.sim}
+    manifest["dat"] = put("dat", rdata.dat)
+    # initial processed data is usually the magnitude of, or the raw data itself - only stored if it is neither
+    amp = rdata.proc.get_curr_amp()
+    if amp is rdata.dat:
+        manifest["proc"] = "dat"
+    elif amp is rdata._derived.get("mag", (None, None))[1]:
+        manifest["proc"] = "mag"
+    else:
+        manifest["proc"] = put("proc", amp)
+    manifest["twtt"] = put("twtt", rdata.twtt) if rdata.twtt is not None else None
+    manifest["sim"] = put("sim", rdata.get_sim_amp()) if rdata.get_sim_amp() is not None else None
+    manifest["srfElev"] = put("srfElev", rdata.srfElev) if rdata.srfElev is not None else None
+    manifest["asep"] = put("asep", rdata.asep) if np.ndim(rdata.asep) else rdata.asep
+    manifest["traceheaders"] = None
+    if rdata.traceheaders is not None:
+        th = vars(rdata.traceheaders)
+        manifest["traceheaders"] = {attr: put("th_{}".format(attr), val) if isinstance(val, np.ndarray) else val for attr, val in th.items()}
+    manifest["navdf"] = [[col, put("nav_{}".format(i), rdata.navdf[col].to_numpy())] for i, col in enumerate(rdata.navdf.columns)]
+    manifest["pick"] = {"srf": rdata.pick.get_srf(),
+                        "horizons": [[h, put("pick_{}".format(i), arr)] for i, (h, arr) in enumerate(rdata.pick.horizons.items())]}
+
+    tmp = os.path.join(path, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, default=_tojson)
+    os.replace(tmp, os.path.join(path, "manifest.json"))
+    return path
+
+
+# load rebuilds a garlic object from a valid cache entry - None if the file is not cached, or the source has changed since
+# radar data and clutter simulation arrays are memory mapped read only, per-trace arrays are read into memory
+def load(fpath, cachedir, simpath=None, navcrs=None, body=None):
+    path = entry(cachedir, fpath, simpath, navcrs, body)
+    try:
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if {k: manifest.get(k) for k in ("version", "fpath", "size", "mtime", "simpath", "navcrs", "body", "precision")} != \
+        stamp(fpath, simpath, navcrs, body):
+        return None
+
+    def get(name, mmap=False):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    rdata = garlic(fpath)
+    for attr, val in manifest["attrs"].items():
+        setattr(rdata, attr, val)
+    rdata.info = manifest["info"]
+    rdata.flags.sampzero = manifest["flags"]["sampzero"]
+    rdata.set_dat(get(manifest["dat"], mmap=True))
+    if manifest["proc"] == "dat":
+        rdata.set_proc(rdata.dat)
+    elif manifest["proc"] == "mag":
+        rdata.set_proc(rdata.get_mag())
+    else:
+        rdata.set_proc(get(manifest["proc"], mmap=True))
+    if manifest["twtt"] is not None:
+        rdata.set_twtt(arr=get(manifest["twtt"]))
+    if manifest["sim"] is not None:
+        rdata.set_sim(get(manifest["sim"], mmap=True))
+    rdata.flags.sim = manifest["flags"]["sim"]
+    if manifest["srfElev"] is not None:
+        rdata.set_srfElev(dat=get(manifest["srfElev"]))
+    rdata.asep = get(manifest["asep"]) if isinstance(manifest["asep"], str) else manifest["asep"]
+    rdata.navdf = pd.DataFrame({col: get(name) for col, name in manifest["navdf"]})
+    if manifest["traceheaders"] is not None:
+        rdata.traceheaders = TraceHeaders(rdata.tnum)
+        for attr, val in manifest["traceheaders"].items():
+            setattr(rdata.traceheaders, attr, get(val) if isinstance(val, str) else val)
+    rdata.pick.set_srf(manifest["pick"]["srf"])
+    for h, name in manifest["pick"]["horizons"]:
+        rdata.pick.horizons[h] = get(name)
+
+    rdata.check_attrs()
+    return rdata
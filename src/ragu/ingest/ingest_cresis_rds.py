@@ -14,6 +14,20 @@ import h5py, fnmatch
 import numpy as np
 import sys
 import matplotlib.pyplot as plt
+# probe is a method to determine whether a file is a CReSIS RDS data file by checking the radar name record
+def probe(fpath):
+    try:
+        if not h5py.is_hdf5(fpath):
+            return False
+        with h5py.File(fpath, "r") as f:
+            if ("param_records" not in f) or ("Data" not in f):
+                return False
+            return "mcords" in str(f["param_records"]["radar_name"][:], 'utf-16')
+    except Exception:
+        pass
+    return False
+
+
 # method to ingest CReSIS RDS data
 def read_mat(fpath, navcrs, body):
     rdata = garlic(fpath)
@@ -28,7 +42,7 @@ def read_mat(fpath, navcrs, body):
         return
 
     rdata.set_dat(np.array(f["Data"][:].T))
-    rdata.set_proc(np.abs(rdata.get_dat()))
+    rdata.set_proc(rdata.get_mag())
     rdata.snum = rdata.dat.shape[0]                                                 # samples per trace in rgram
     rdata.tnum = rdata.dat.shape[1]                                                 # number of traces in rgram 
     rdata.set_twtt(arr = f["Time"][:].flatten())                                    # set two way travel time
@@ -17,6 +17,18 @@ import scipy as sp
 import sys
 
 
+# probe is a method to determine whether a file is a groundhog data file by inspecting the hdf5 group structure
+def probe(fpath):
+    try:
+        with h5py.File(fpath, "r") as f:
+            for grp in ["proc", "restack", "raw"]:
+                if grp in f:
+                    return ("rx0" in f[grp]) and ("fs" in f[grp]["rx0"].attrs)
+    except Exception:
+        pass
+    return False
+
+
 # method to ingest groundhog hdf5 data format
 def read_h5(fpath, navcrs, body):
     rdata = garlic(fpath)
@@ -46,7 +58,7 @@ def read_h5(fpath, navcrs, body):
 
     rdata.nchan = 1
 
-    rdata.set_dat(f[grp]["rx0"][:].astype(float))
+    rdata.set_dat(f[grp]["rx0"][:])
 
     # get system info
     try:
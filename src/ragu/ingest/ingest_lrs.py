@@ -13,8 +13,23 @@ from ragu.tools import utils
 import numpy as np
 import os, sys
 
+# probe is a method to determine whether a file is an LRS radargram using the PDS label keys
+def probe(fpath):
+    lbl_path = fpath.replace(".img", ".lbl")
+    if not os.path.isfile(lbl_path):
+        return False
+    try:
+        lbl = utils.read_lbl(lbl_path)
+    except Exception:
+        return False
+    if "FILE_RECORDS" not in lbl:
+        return False
+    return any(("LRS" in lbl.get(key, "")) or ("SELENE" in lbl.get(key, "")) or ("KAGUYA" in lbl.get(key, ""))
+                for key in ["INSTRUMENT_ID", "INSTRUMENT_NAME", "MISSION_NAME", "SPACECRAFT_NAME", "INSTRUMENT_HOST_NAME", "DATA_SET_ID"])
+
+
 # method to read KAGUYA (SELENE) LRS SAR data
-def read(fpath, simpath, navcrs, body):
+def read(fpath, simpath, navcrs, body, mmap=True):
     rdata = garlic(fpath)
     rdata.fn = fpath.split("/")[-1][:-4]
     rdata.dtype = "lrs"
@@ -26,17 +41,15 @@ def read(fpath, simpath, navcrs, body):
     rdata.tnum = int(lbl[19].split('=')[1])
     rdata.snum = 1000
 
-    # convert binary .img RGRAM to numpy array - data begins after 55 bytes of header info
-    with open(rdata.fpath, "rb") as f:
-        f.seek(rdata.tnum*55)
-        tmp = f.read(rdata.tnum*rdata.snum)
-        dat = np.frombuffer(tmp, np.uint8)
-    l = len(dat)
+    # memory map binary .img RGRAM as read-only numpy array - data begins after 55 bytes of header info per trace
+    dat = np.memmap(rdata.fpath, dtype=np.uint8, mode="r", offset=rdata.tnum*55, shape=(rdata.snum,rdata.tnum))
+    if not mmap:
+        dat = np.array(dat)
 
     rdata.dt = 305.17578125e-09
     rdata.prf = 20
     rdata.nchan = 1
-    rdata.set_dat(dat.reshape(rdata.snum,rdata.tnum))
+    rdata.set_dat(dat)
     rdata.set_proc(rdata.get_dat())
     
     # convert binary .img clutter sim product to numpy array
@@ -46,9 +59,7 @@ def read(fpath, simpath, navcrs, body):
         simpath = root + "/" + rdata.fn + "_geom_combined.img"
 
     if os.path.isfile(simpath):
-        with open(simpath, "rb") as f:
-            sim = np.fromfile(f, np.float32)   
-        sim = sim.reshape(rdata.snum,rdata.tnum)
+        sim = np.memmap(simpath, dtype=np.float32, mode="r", shape=(rdata.snum,rdata.tnum))
         rdata.set_sim(sim)
 
     rdata.set_twtt()
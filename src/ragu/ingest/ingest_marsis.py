@@ -16,8 +16,23 @@ import numpy as np
 import os, sys, glob
 import matplotlib.pyplot as plt
 
+# probe is a method to determine whether a file is a JPL MARSIS radargram - check file size and presence of orbit geom file without reading data
+def probe(fpath):
+    fn = fpath.split("/")[-1]
+    orbit = fn.split('_')
+    if len(orbit) < 2:
+        return False
+    orbit = orbit[0] + '_' + orbit[1]
+    # clutter simulations sit alongside radargrams with the same orbit prefix
+    if fn[:-4].endswith("_clutter"):
+        return False
+    if os.path.getsize(fpath) % (2048*8*4) != 0:
+        return False
+    return os.path.isfile(os.path.join(os.path.dirname(fpath), orbit + "_geom.tab"))
+
+
 # method to read JPL multilook MARSIS data
-def read(fpath, simpath, navcrs, body):
+def read(fpath, simpath, navcrs, body, mmap=True):
     fn = fpath.split("/")[-1]
     root = fpath.rstrip(fn)
     orbit = fn.split('_')
@@ -26,12 +41,9 @@ def read(fpath, simpath, navcrs, body):
     rdata.fn = fn[:-4]
     rdata.dtype = "marsis"
 
-    # convert binary RGRAM to numpy array
-    # # reshape array
+    # memory map binary RGRAM as read-only numpy array
     dtype = np.dtype("float32")     
-    with open(fpath, "rb") as f:
-        dat = np.fromfile(f, dtype)     
-    l = len(dat)
+    l = os.path.getsize(fpath) // dtype.itemsize
 
     rdata.snum = 2048
     # get number of traces, dividing file length by number of samples per trace, by 8 data arrays
@@ -42,18 +54,17 @@ def read(fpath, simpath, navcrs, body):
     rdata.prf = 127
     rdata.nchan = 2
 
-    # reshape into 8 stacked rgrams
-    dat = dat.reshape((rdata.snum*8,rdata.tnum),order="F")
+    # map as 8 stacked rgrams - each trace holds 8 consecutive rgram columns (fortran order)
+    dat = np.memmap(fpath, dtype=dtype, mode="r", shape=(rdata.snum,8,rdata.tnum), order="F")
 
-    # reprocessed MARSIS data should be bottom two rgrams
-    dat = dat[-(rdata.snum*rdata.nchan):,:]
+    # reprocessed MARSIS data should be bottom two rgrams - view as stacked 3D array for two channels, only these pages are read from disk
+    dat = dat[:,-rdata.nchan:,:].transpose(0,2,1)
 
-    # reshape into stacked 3D array for two channels
-    tmp = np.zeros((rdata.snum,rdata.tnum,rdata.nchan))
-    tmp[:,:,0] = dat[:rdata.snum,:]
-    tmp[:,:,1] = dat[-rdata.snum:,:]
     # apparently data arrays are already power values, so revert to amplitude (abs(amplitude))
-    rdata.set_dat(np.sqrt(tmp))
+    # this is the only copy made of the data, and it retains single precision
+    if not mmap:
+        dat = np.array(dat)
+    rdata.set_dat(np.sqrt(dat))
     rdata.set_proc(rdata.get_dat())
 
     # convert png clutter sim product to numpy array
@@ -63,10 +74,8 @@ def read(fpath, simpath, navcrs, body):
         simpath = root + "/" + orbit + "_clutter.img"
 
     if os.path.isfile(simpath):
-        with open(simpath,"rb") as f:
-            dat = np.fromfile(f, np.uint8)
-            sim = dat.reshape(rdata.snum, rdata.tnum)
-            rdata.set_sim(sim)
+        sim = np.memmap(simpath, dtype=np.uint8, mode="r", shape=(rdata.snum,rdata.tnum))
+        rdata.set_sim(sim)
     else:
         print("Clutter simulation not found:\t{}\nSpecify alternate path in configuration file.".format(simpath))
 
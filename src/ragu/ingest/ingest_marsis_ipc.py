@@ -16,27 +16,33 @@ import numpy as np
 import os, sys, glob
 import matplotlib.pyplot as plt
 
+# probe is a method to determine whether a file is a MARSIS radargram processed by Michael Christoffersen - check file size and presence of nav file without reading data
+def probe(fpath):
+    fn = fpath.split("/")[-1][:-4]
+    if os.path.getsize(fpath) % (512*4) != 0:
+        return False
+    return os.path.isfile(os.path.join(os.path.dirname(fpath), fn[:-2] + "nav.csv"))
+
+
 # method to read JPL multilook MARSIS data
-def read(fpath, simpath, navcrs, body):
+def read(fpath, simpath, navcrs, body, mmap=True):
     rdata = garlic(fpath)
     rdata.fn = fpath.split("/")[-1][:-4]
     rdata.dtype = "marsis_ipc"
     root = os.path.dirname(fpath)
 
-    # convert binary RGRAM to numpy array
-    # # reshape array, knowing that each trace has 512 samples
+    # memory map binary RGRAM as read-only numpy array, knowing that each trace has 512 samples
     dtype = np.dtype("float32")     
-    with open(fpath, "rb") as f:
-        tmp = np.fromfile(f, dtype)     
-    l = len(tmp)
-
     rdata.snum = 512
-    rdata.tnum = int(len(tmp)/rdata.snum)
+    rdata.tnum = int(os.path.getsize(fpath)/dtype.itemsize/rdata.snum)
     rdata.fs = 1.4e6
     rdata.dt = rdata.fs
     rdata.prf = 127
     rdata.nchan = 1
-    rdata.set_dat(tmp.reshape((rdata.snum,rdata.tnum), order='F'))
+    dat = np.memmap(fpath, dtype=dtype, mode="r", shape=(rdata.snum,rdata.tnum), order='F')
+    if not mmap:
+        dat = np.array(dat)
+    rdata.set_dat(dat)
     rdata.set_proc(rdata.get_dat())
 
     # convert binary .img clutter sim product to numpy array
@@ -46,9 +52,7 @@ def read(fpath, simpath, navcrs, body):
         simpath = root + "/" + rdata.fn + "_geom_combined.img"
 
     if os.path.isfile(simpath):
-        with open(simpath, "rb") as f:
-            sim = np.fromfile(f, dtype)   
-        sim = sim.reshape(rdata.snum,rdata.tnum)
+        sim = np.memmap(simpath, dtype=dtype, mode="r", shape=(rdata.snum,rdata.tnum))
         rdata.set_sim(sim)
     else:
         print("Clutter simulation not found:\t{}\nSpecify alternate path in configuration file.".format(simpath))
@@ -16,6 +16,24 @@ import numpy as np
 import scipy as sp
 import sys
 
+# probe is a method to determine whether a file is an OIB-AK data file by inspecting the hdf5 group structure or matlab variable names
+def probe(fpath):
+    try:
+        if fpath.lower().endswith(".h5"):
+            with h5py.File(fpath, "r") as f:
+                return ("raw" in f) and ("drv" in f) and ("proc0" in f["drv"]) and \
+                        ("tx0" in f["raw"]) and ("pulseRepetitionFrequency" in f["raw"]["tx0"].attrs)
+        elif fpath.lower().endswith(".mat"):
+            if h5py.is_hdf5(fpath):
+                with h5py.File(fpath, "r") as f:
+                    return "block" in f
+            # older matlab files - only read variable headers
+            return "block" in [var[0] for var in sp.io.whosmat(fpath)]
+    except Exception:
+        pass
+    return False
+
+
 # method to ingest OIB-AK radar hdf5 data format
 def read_h5(fpath, navcrs, body):
     rdata = garlic(fpath)
@@ -48,7 +66,7 @@ def read_h5(fpath, navcrs, body):
 
     # pull radar proc and sim arrayss
     rdata.set_dat(f["drv/proc0"][:])                                            # pulse compressed array
-    rdata.set_proc(np.abs(rdata.get_dat()))
+    rdata.set_proc(rdata.get_mag())
     if "clutter0" in f["drv"].keys():
         rdata.set_sim(f["drv"]["clutter0"][:])                                  # simulated clutter array
 
@@ -13,6 +13,33 @@ from ragu.nav import navparse
 import os,sys,struct,datetime,re
 import numpy as np
 
+def dt1_dtype(snum):
+    """Structured dtype for a single DT1 trace record - 128 byte header (25 float32 + 28 byte comment) followed by snum int16 samples."""
+    return np.dtype([("trace_number", "<f4"),
+                     ("position", "<f4"),
+                     ("points_per_trace", "<f4"),
+                     ("topography", "<f4"),
+                     ("_h4", "<f4"),
+                     ("bytes_per_point", "<f4"),
+                     ("_h6", "<f4"),
+                     ("n_stackes", "<f4"),
+                     ("time_window", "<f4"),
+                     ("pos_x", "<f4"),
+                     ("_h10", "<f4"),
+                     ("pos_y", "<f4"),
+                     ("_h12", "<f4"),
+                     ("pos_z", "<f4"),
+                     ("receive", "<f4", (3,)),
+                     ("transmit", "<f4", (3,)),
+                     ("tz_adjustment", "<f4"),
+                     ("zero_flag", "<f4"),
+                     ("_h22", "<f4"),
+                     ("time_of_day", "<f4"),
+                     ("comment_flag", "<f4"),
+                     ("comment", "S28"),
+                     ("data", "<i2", (snum,))])
+
+
 class TraceHeaders:
     """Class used internally to handle pulse-ekko headers."""
 
@@ -35,6 +62,30 @@ class TraceHeaders:
         self.comment_flag = np.zeros((1, tnum))
         self.comment = ['' for i in range(tnum)]
 
+    @classmethod
+    def from_records(cls, records):
+        """Create the trace headers for all traces at once from a structured array of DT1 trace records."""
+        headers = cls(len(records))
+        headers.trace_numbers[0] = records["trace_number"]
+        headers.positions[0] = records["position"]
+        headers.points_per_trace[0] = records["points_per_trace"]
+        headers.topography[0] = records["topography"]
+        headers.bytes_per_point[0] = records["bytes_per_point"]
+        headers.n_stackes[0] = records["n_stackes"]
+        headers.time_window[0] = records["time_window"]
+        headers.pos[0] = records["pos_x"]
+        headers.pos[1] = records["pos_y"]
+        headers.pos[2] = records["pos_z"]
+        headers.receive[:] = records["receive"].T
+        headers.transmit[:] = records["transmit"].T
+        headers.tz_adjustment[0] = records["tz_adjustment"]
+        headers.zero_flag[0] = records["zero_flag"]
+        headers.time_of_day[0] = records["time_of_day"]
+        headers.comment_flag[0] = records["comment_flag"]
+        headers.comment = [c.decode("ascii", errors="ignore") for c in records["comment"]]
+        headers.header_index = len(records)
+        return headers
+
     def get_header(self, offset, f_lines):
         """Get the header information for a single trace."""
         header = struct.unpack('<25f', f_lines[offset: offset + 25 * 4])
@@ -137,31 +188,18 @@ def read_dt1(fpath, navcrs, body):
     if not os.path.isfile(infile_gps):
         infile_gps = fpath[:-4] + ".GP2"
     infile_hd = fpath[:-4] + ".HD"
-    headlen = 32
     with open(fpath,"rb") as datafile:
         datafile.seek(8,0) # 0 is beginning of file       
-        snum, = struct.unpack('f',datafile.read(4))
+        snum, = struct.unpack('<f',datafile.read(4))
         rdata.snum = int(snum)
-        dimtrace = rdata.snum*2+128
-        datafile.seek(-dimtrace,2) # 2 stands for end of file
-        tnum, = struct.unpack('f',datafile.read(4))
-        rdata.tnum = int(tnum)
-        # Initialize matrix
-        rdata.set_dat(np.zeros((rdata.snum,rdata.tnum)))
-        head = np.zeros((headlen,rdata.tnum))
-        # Set the reader to the beginning of the file
+        # read all trace records at once - each record is a 128 byte header followed by the trace samples
         datafile.seek(0,0)
-        for j in range(0,rdata.tnum):
-            # Read the header info
-            for k in range(0,headlen):
-                info, =  struct.unpack('f',datafile.read(4))
-                head[k,j] = info
-            # Now the actual data
-            for k in range(0,rdata.snum):
-                # 2 is the size of short, 'h' is the symbol
-                pnt, = struct.unpack('h',datafile.read(2))
-                rdata.dat[k,j] = pnt
-            datafile.seek(dimtrace*(j+1),0) 
+        traces = np.fromfile(datafile, dtype=dt1_dtype(rdata.snum))
+    rdata.tnum = len(traces)
+    # trace header fields as columns
+    rdata.traceheaders = TraceHeaders.from_records(traces)
+    # signed int amplitude samples, one column per trace
+    rdata.set_dat(traces["data"].T)
     # known vars that are not really set
     rdata.nchan = 1
     rdata.trace_num = np.arange(rdata.tnum) + 1
@@ -174,7 +212,7 @@ def read_dt1(fpath, navcrs, body):
     rdata.info.pop("Total_time_window")
 
     # convert signed int amplitude to floating point for displaying
-    rdata.set_proc(rdata.get_dat().astype(float))
+    rdata.set_proc(rdata.get_dat())
 
     rdata.set_twtt()
 
@@ -28,6 +28,17 @@ import matplotlib.pyplot as plt
 ##         f_.to_csv(fn[:-4]+'_'+n+'.csv')
 ####
 
+# probe is a method to determine whether a file is a RIMFAX radargram csv - check the header row for record type and sample columns without reading data
+def probe(fpath):
+    try:
+        with open(fpath, "r") as f:
+            header = f.readline().strip().split(",")
+        return ("record_type" in header) and ("s0001" in header)
+    except Exception:
+        pass
+    return False
+
+
 def read(fpath, navcrs, body):
     rdata = garlic(fpath)
     rdata.fn = fpath.split("/")[-1][:-4]
@@ -44,7 +55,7 @@ def read(fpath, navcrs, body):
     dat = dat[filt,:]
 
     rdata.set_dat(np.array(dat).T)                                                      # transpose 
-    rdata.set_proc(np.abs(rdata.get_dat()))
+    rdata.set_proc(rdata.get_mag())
 
     rdata.snum, rdata.tnum =  dat.shape                                                 # snum, tnum
     rdata.dt = np.mean(f["sample_time_increment"])*1e-9                                 # sampling interval, sec - don't know if it's necessary to use the mean. i wouldn't expect the value doesn't change, but not sure
@@ -14,8 +14,18 @@ from ragu.tools import utils
 import numpy as np
 import os, sys
 
+# probe is a method to determine whether a file is a SHARAD radargram - check file naming, size, and presence of geom file without reading data
+def probe(fpath):
+    fn = fpath.split("/")[-1]
+    if not fn.endswith("_rgram.img"):
+        return False
+    if os.path.getsize(fpath) % (3600*4) != 0:
+        return False
+    return os.path.isfile(os.path.join(os.path.dirname(fpath), fn[:-10] + "_geom.tab"))
+
+
 # method to read PDS SHARAD USRDR data
-def read(fpath, simpath, navcrs, body):
+def read(fpath, simpath, navcrs, body, mmap=True):
     rdata = garlic(fpath)
     if fpath.endswith("sim.img") or fpath.endswith("geom_combined.img"):
         return rdata
@@ -24,19 +34,18 @@ def read(fpath, simpath, navcrs, body):
     root = os.path.dirname(fpath)
 
     # rdata.fn = fn.rstrip("_rgram.img")
-    # convert binary .img PDS RGRAM to numpy array
-    # reshape array with 3600 lines
+    # memory map binary .img PDS RGRAM as read-only numpy array with 3600 lines
+    # data is only paged in from disk as it is accessed, unless mmap is False
     dtype = np.dtype("float32")     
-    with open(fpath, "rb") as f:
-        tmp = np.fromfile(f, dtype)     
-    l = len(tmp)
-
     rdata.snum = 3600
-    rdata.tnum = int(len(tmp)/rdata.snum)
+    rdata.tnum = int(os.path.getsize(fpath)/dtype.itemsize/rdata.snum)
     rdata.dt = .0375e-6
     rdata.prf = 700.28
     rdata.nchan = 1
-    rdata.set_dat(tmp.reshape(rdata.snum,rdata.tnum))
+    dat = np.memmap(fpath, dtype=dtype, mode="r", shape=(rdata.snum,rdata.tnum))
+    if not mmap:
+        dat = np.array(dat)
+    rdata.set_dat(dat)
     rdata.set_proc(rdata.get_dat())
 
     # convert binary .img clutter sim product to numpy array
@@ -52,14 +61,13 @@ def read(fpath, simpath, navcrs, body):
             simpath = root + "/" + rdata.fn + "_geom_combined.img"
 
     if os.path.isfile(simpath):
-        with open(simpath, "rb") as f:
-            sim = np.fromfile(f, dtype)
-        # reshape - will be different depending on sim version
+        # offset will be different depending on sim version
         if simpath.endswith('sim.img'):
-            # just take combined sim if PDS v4 sim
-            sim = sim[2 * len(sim) // 3 :].reshape(rdata.snum,rdata.tnum)
+            # just map combined sim if PDS v4 sim
+            offset = (2 * (os.path.getsize(simpath) // dtype.itemsize) // 3) * dtype.itemsize
         else:
-            sim = sim.reshape(rdata.snum, rdata.tnum)
+            offset = 0
+        sim = np.memmap(simpath, dtype=dtype, mode="r", offset=offset, shape=(rdata.snum,rdata.tnum))
     
         rdata.set_sim(sim)
     else:
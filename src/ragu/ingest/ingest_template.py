@@ -7,6 +7,7 @@
 ingest_template is a RAGU data ingest template. Follow this basic template format and modify to read your radar data type.
 
 NOTE: ingest/__init__.py must also be modified after creating a new ingester for RAGU to be able to ingest your data type 
+if your file extension is shared with other data types (.h5, .mat, .img), add your module to the ingest.readers registry and define a probe method
 ALSO: nav/navparse.py will need an additional method for reading your navigation data
 """
 ### necessary imports, different data types may require additional ###
@@ -18,6 +19,15 @@ import numpy as np
 import scipy as sp
 import sys
 
+# probe is a method to cheaply determine whether a file is of your data type - only inspect file headers, hdf5 group names, or label keys, don't read the data
+def probe(fpath):
+    try:
+        with h5py.File(fpath, "r") as f:
+            return "blah" in f
+    except Exception:
+        return False
+
+
 # method to ingest your data
 def read_dat(fpath, navcrs, body):
     # initialize the radar data object - garlic() takes the data file path
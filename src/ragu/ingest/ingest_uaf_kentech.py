@@ -15,6 +15,17 @@ import numpy as np
 import scipy as sp
 import sys
 
+# probe is a method to determine whether a file is a uaf kentech data file by inspecting the hdf5 group structure
+def probe(fpath):
+    try:
+        with h5py.File(fpath, "r") as f:
+            return ("raw" in f) and ("drv" in f) and ("proc0" in f["drv"]) and ("loc0" in f["raw"]) and \
+                    ("rx0" in f["raw"]) and ("samplesPerTrace" in f["raw"]["rx0"].attrs)
+    except Exception:
+        pass
+    return False
+
+
 # method to ingest OIB-AK radar hdf5 data format
 def read_h5(fpath, navcrs, body):
     rdata = garlic(fpath)
@@ -47,7 +58,7 @@ def read_h5(fpath, navcrs, body):
 
     # pull radar proc and sim arrayss
     rdata.set_dat(f["drv/proc0"][:])                                            # pulse compressed array
-    rdata.set_proc(np.abs(rdata.get_dat()))
+    rdata.set_proc(rdata.get_mag())
 
     rdata.set_twtt()
     # assign signal info
@@ -0,0 +1,120 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+areoid is a process-wide service for sampling a global reference surface raster along a spacecraft track
+"""
+### imports ###
+import os, threading, hashlib
+import numpy as np
+import rasterio as rio
+from rasterio.transform import rowcol
+from rasterio.windows import Window
+
+# default mars areoid raster
+aerPath = os.path.join(os.path.dirname(__file__), '../dat/mars', 'mega90n000eb.tif')
+
+#: str, directory under which .npy copies of reference rasters are kept - None to only read raster windows
+cachedir = None
+
+# open areoid services keyed by raster path
+_cache = {}
+_lock = threading.Lock()
+
+
+# set_cachedir sets the directory under which reference raster copies are written in this process
+def set_cachedir(path=None):
+    global cachedir
+    cachedir = os.path.expanduser(path) if path else None
+
+
+class areoid:
+    """
+    keep a reference raster open for the life of the process and sample it along a track.
+    by default only the window bounding the track is read from the raster. once a cache directory is set, a .npy copy
+    of the raster is written under it on first use, then memory mapped and indexed directly.
+    """
+    def __init__(self, fpath):
+        self.fpath = fpath
+        self.lock = threading.Lock()
+        self.ds = rio.open(fpath, mode="r")
+        self.crs = self.ds.crs.to_proj4()
+        self.arr = None
+        #: str, cache directory the raster copy was last looked for in
+        self.copyDir = None
+        self.open_copy()
+
+
+    # memory map the raster copy under the cache directory, writing it if it does not yet exist
+    def open_copy(self):
+        if (cachedir is None) or (cachedir == self.copyDir):
+            return
+        self.copyDir = cachedir
+        npyPath = self.npy_path()
+        if os.path.isfile(npyPath):
+            arr = np.load(npyPath, mmap_mode="r")
+            if arr.shape == (self.ds.height, self.ds.width):
+                self.arr = arr
+                return
+        try:
+            self.to_npy()
+        except OSError as err:
+            print("Unable to write areoid copy {}: {}".format(npyPath, err))
+
+
+    # copy path under the cache directory - keyed by source path, size and modification time so a changed raster is copied again
+    def npy_path(self):
+        st = os.stat(self.fpath)
+        h = hashlib.sha1("{}_{}_{}".format(os.path.abspath(self.fpath), st.st_size, st.st_mtime).encode()).hexdigest()[:12]
+        return os.path.join(cachedir, "areoid", "{}_{}.npy".format(os.path.splitext(os.path.basename(self.fpath))[0], h))
+
+
+    # sample raster values at x/y positions given in the raster crs
+    def sample(self, x, y):
+        # rasterio may return an index exceeding the raster bounds when a track is pole-crossing - clip to valid range
+        rows, cols = rowcol(self.ds.transform, np.asarray(x), np.asarray(y))
+        rows = np.clip(np.asarray(rows, dtype=int), 0, self.ds.height - 1)
+        cols = np.clip(np.asarray(cols, dtype=int), 0, self.ds.width - 1)
+
+        if self.arr is not None:
+            return np.asarray(self.arr[rows, cols])
+
+        # read only the window bounding the track
+        r0, c0 = rows.min(), cols.min()
+        window = Window(col_off=c0, row_off=r0, width=cols.max() - c0 + 1, height=rows.max() - r0 + 1)
+        with self.lock:
+            block = self.ds.read(1, window=window)
+        return block[rows - r0, cols - c0]
+
+
+    # write a .npy copy of the raster under the cache directory for memory mapped sampling
+    def to_npy(self):
+        npyPath = self.npy_path()
+        os.makedirs(os.path.dirname(npyPath), exist_ok=True)
+        # write to a temporary file first, so other processes never map a partial copy
+        tmp = "{}.{}.tmp".format(npyPath, os.getpid())
+        with self.lock:
+            arr = self.ds.read(1)
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, npyPath)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+        self.arr = np.load(npyPath, mmap_mode="r")
+        return npyPath
+
+
+# get_areoid returns the shared areoid service for a raster path, opening it on first use
+def get_areoid(fpath=aerPath):
+    fpath = os.path.abspath(fpath)
+    with _lock:
+        if fpath not in _cache:
+            _cache[fpath] = areoid(fpath)
+        else:
+            # a service opened before a cache directory was set picks up its raster copy now
+            _cache[fpath].open_copy()
+        return _cache[fpath]
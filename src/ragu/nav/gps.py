@@ -4,9 +4,10 @@ modified from ImpDAR - DOI:10.5281/zenodo.3833057
 """
 ### imports ###
 import numpy as np
+import pandas as pd
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
-import sys
+import sys, io, codecs
 
 class nmea_info:
     """Container for general information about lat, lon, etc.
@@ -62,6 +63,81 @@ class nmea_info:
         return self.times
 
 
+def gga_array(list_of_sentences):
+    """
+    Parse GGA sentences into an array in a single vectorized pass.
+
+    Parameters
+    ----------
+    list_of_sentences : list of strs
+        GGA sentences.
+
+    Returns
+    -------
+    np.ndarray
+        (n x 10) array of [time, lat, lat sign, lon, lon sign, fix quality, n satellites, hdop, elevation, geoid separation],
+        with empty fields set to zero.
+    """
+    block = "\n".join(sentence.rstrip("\r\n") for sentence in list_of_sentences)
+    df = pd.read_csv(io.StringIO(block), header=None, names=range(20), dtype=str)
+    num = lambda cols: df[cols].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+    out = np.zeros((len(df), 10))
+    out[:, [0, 1]] = num([1, 2])
+    out[:, 2] = np.where(df[3] == "S", -1, 1)
+    out[:, 3] = num([4])[:, 0]
+    out[:, 4] = np.where(df[5] == "W", -1, 1)
+    out[:, 5:9] = num([6, 7, 8, 9])
+    out[:, 9] = num([11])[:, 0]
+    return out
+
+
+def read_nmea(fpath, marker, get_scan):
+    """
+    Read trace markers and GGA sentences from an NMEA log in a single pass.
+
+    Each trace marker is paired with the first GGA sentence which follows it,
+    markers with no GGA sentence before the next marker are skipped.
+
+    Parameters
+    ----------
+    fpath : str
+        NMEA log file path.
+    marker : str
+        Prefix of lines which mark a radar trace (e.g. "$GSSIS", "Trace").
+    get_scan : function
+        Returns the trace index from a marker line.
+
+    Raises
+    ------
+    ValueError
+        If the file does not contain paired trace marker and GGA records.
+
+    Returns
+    -------
+    scans : np.ndarray
+        Trace index for each GGA record.
+    gga : np.ndarray
+        Array of the useful information in the GGA sentences, see gga_array.
+    """
+    scans = []
+    sentences = []
+    scan = None
+    with codecs.open(fpath, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.lstrip()
+            if line.startswith(marker):
+                scan = get_scan(line)
+            elif (scan is not None) and line.startswith("$") and (line[3:6] == "GGA"):
+                scans.append(scan)
+                sentences.append(line)
+                scan = None
+
+    if not sentences:
+        raise ValueError("Missing {} or GGA records in the file.".format(marker))
+
+    return np.asarray(scans), gga_array(sentences)
+
+
 def nmea_all_info(list_of_sentences):
     """
     Return an object with the nmea info from a given list of sentences.
@@ -81,26 +157,9 @@ def nmea_all_info(list_of_sentences):
     np.ndarray
         An array of the useful information in the NMEA sentences.
     """
-    def _gga_sentence_split(sentence):
-        all = sentence.split(',')
-        if len(all) > 5:
-            numbers = list(map(lambda x: float(x) if x != '' else 0, all[1:3] + [1] + [all[4]] + [1] + all[6:10] + [all[11]]))
-            if all[3] == 'S':
-                numbers[2] = -1
-            if all[5] == 'W':
-                numbers[4] = -1
-        elif len(all) > 2:
-            numbers = list(map(lambda x: float(x) if x != '' else 0, all[1:3] + [1]))
-            if all[3] == 'S':
-                numbers[2] = -1
-        else:
-            numbers = np.nan
-        return numbers
-
-    if list_of_sentences[0].split(',')[0] == '$GPGGA':
+    if list_of_sentences[0].split(',')[0][3:] == 'GGA':
         data = nmea_info()
-        data.all_data = np.array([_gga_sentence_split(sentence)
-                                  for sentence in list_of_sentences])
+        data.all_data = gga_array(list_of_sentences)
         return data
     else:
         print(list_of_sentences[0].split(',')[0])
@@ -115,8 +174,8 @@ class GPSdat(nmea_info):
 
     Parameters
     ----------
-    gga : list of strs
-        The GPS data
+    gga : list of strs or np.ndarray
+        The GPS data, either GGA sentences or an array already parsed with gga_array
     scans : list of floats
         traces in radargram for which gps data was acquired
     trace_num : np array
@@ -130,7 +189,11 @@ class GPSdat(nmea_info):
 
     def __init__(self, gga, scans, trace_num):
         # parse recorded nmea strings
-        self.nmea_info = nmea_all_info(gga)
+        if isinstance(gga, np.ndarray):
+            self.nmea_info = nmea_info()
+            self.nmea_info.all_data = gga
+        else:
+            self.nmea_info = nmea_all_info(gga)
         self.nmea_info.scans = scans
         self.nmea_info.get_all()
         # get time stamps where data recorded to interpolate between
@@ -8,15 +8,16 @@ nav library contains various fucntions for reading radar nav data and transformi
 """
 ### imports ###
 from ragu.raguError import raguError
-from ragu.nav.gps import GPSdat
+from ragu.nav.gps import GPSdat, read_nmea
+from ragu.nav.areoid import get_areoid, aerPath
 from ragu.tools.constants import *
-import sys,os
+import sys,os,threading
 import pandas as pd
 import rasterio as rio
 from rasterio.plot import show
 import numpy as np
 import scipy.io as scio
-import h5py, codecs
+import h5py
 from pyproj import Transformer
 import matplotlib.pyplot as plt
 
@@ -32,8 +33,19 @@ xyzsys = {
 }
 
 
-def get_xformer(crs_from, crs_to):
-    return Transformer.from_crs(crs_from=crs_from, crs_to=crs_to)
+# per-thread transformer cache keyed on (crs_from, crs_to, always_xy) - pyproj transformers should not be shared across threads.
+# each thread's cache is released with the thread
+_xformers = threading.local()
+
+
+def get_xformer(crs_from, crs_to, always_xy=False):
+    cache = getattr(_xformers, "cache", None)
+    if cache is None:
+        cache = _xformers.cache = {}
+    key = (str(crs_from), str(crs_to), always_xy)
+    if key not in cache:
+        cache[key] = Transformer.from_crs(crs_from=crs_from, crs_to=crs_to, always_xy=always_xy)
+    return cache[key]
 
 
 def interp_xords(df, keys=["lon","lat","elev"]):
@@ -324,45 +336,11 @@ def getnav_cresis_mat(navfile, navcrs, body):
 def getnav_gssi(navfile, tnum, navcrs, body):
     if os.path.isfile(navfile):
         try:
-            with codecs.open(navfile, "r", encoding="utf-8", errors="ignore") as f_in:
-                lines = f_in.readlines()
-            # We have to be careful with this to permit other NMEA strings to have been recorded
-            # and to be sure that the indices line up
-            gssis_inds = [i for i, line in enumerate(lines) if "GSSIS" in line]
-            gga_inds = [i for i, line in enumerate(lines) if "GGA" in line]
-
-            if not gssis_inds or not gga_inds:
-                raise ValueError("Missing GSSIS or GGA records in the file.")
-
-            # Ensure we only use GSSIS entries that have corresponding GGA records
-            gssis_inds_keep = []
-            matched_gga_inds = []
-            offset_ind = 0
-
-            for i, j in enumerate(gssis_inds[:-1]):
-                # Find the closest GGA index within the current GSSIS range
-                while offset_ind < len(gga_inds) and gga_inds[offset_ind] < j:
-                    offset_ind += 1  # Move to the next GGA index
-
-                if offset_ind < len(gga_inds) and gga_inds[offset_ind] < gssis_inds[i + 1]:
-                    gssis_inds_keep.append(j)
-                    matched_gga_inds.append(gga_inds[offset_ind])
-                else:
-                    print(f"Warning: No matching GGA for GSSIS at index {j}")
-
-            # Ensure the last GSSIS entry has a corresponding GGA entry
-            if gga_inds[-1] > gssis_inds[-1]:
-                gssis_inds_keep.append(gssis_inds[-1])
-                matched_gga_inds.append(gga_inds[-1])
-
-            # Convert to numpy arrays for consistent indexing
-            scans = np.array([int(lines[i].split(",")[1]) for i in gssis_inds_keep])
-            gga_sentences = [lines[i] for i in matched_gga_inds]
-
-            # Now initialize the GPSdat object safely
-            gps = GPSdat(gga_sentences, scans, tnum)
-
-            # gps = GPSdat([line for i, line in enumerate(lines) if i in gga_inds], scans, tnum)
+            # single pass over the file - we have to be careful with this to permit other NMEA strings to have been recorded
+            # and to be sure that the indices line up, so each GSSIS scan marker is paired with the GGA record which follows it
+            scans, gga = read_nmea(navfile, "$GSSIS", lambda line: int(line.split(",")[1]))
+            gps = GPSdat(gga, scans, tnum)
+
             df = pd.DataFrame({"lon": gps.lon, "lat": gps.lat, "elev": gps.elev,
                                         "x": np.nan, "y": np.nan, "z": np.nan,
                                         "dist": np.nan})
@@ -405,26 +383,10 @@ def getnav_pulseekko(navfile, tnum, navcrs, body):
     """
     if os.path.isfile(navfile):
         try:
-            with open(navfile) as f_in:
-                lines = f_in.readlines()
-            ggis = []
-            gga = []
-            for line in lines:
-                if line[:5] == "Trace":
-                    ggis.append(line)
-                elif line[:6] == "$GPGGA":
-                    gga.append(line)
-                else:
-                    continue
-            if len(gga) == 0:
-                raise ValueError("Can currently only work with gga strings")
-            # scans = np.array(list(map(lambda x: int(float(
-            #     x.rstrip("\n\r ").split(" ")[-1])), ggis)))
+            # single pass over the file pairing each trace marker with the GGA record which follows it
             # i believe that this is what we want for scans, with the actual trace number for each scan
-            scans = np.array(list(map(lambda x: int(float(
-                x.rstrip("\n\r ").split(" ")[1][1:])), ggis))) - 1
-
-            gps = GPSdat([line for line in lines if line in gga], scans, tnum)
+            scans, gga = read_nmea(navfile, "Trace", lambda line: int(float(line.rstrip("\n\r ").split(" ")[1][1:])) - 1)
+            gps = GPSdat(gga, scans, tnum)
             df = pd.DataFrame({"lon": gps.lon, "lat": gps.lat, "elev": gps.elev,
                                         "x": np.nan, "y": np.nan, "z": np.nan,
                                         "dist": np.nan})
@@ -494,10 +456,9 @@ def getnav_sharad(navfile, navcrs, body):
         df["z"].to_numpy())
 
     # SHARAD FPB sample 1800 corresponds to the areoid height - use areoid to reference elevation and get absolute twtt - aeroid height in meters after subtracting 3396000 m
-    # aerPath = os.path.split(os.getcwd())[0] + "/dat/mars/mega90n000eb.tif"
-    aerPath = os.path.join(os.path.dirname(__file__), '../dat/mars', 'mega90n000eb.tif')
+    # the areoid raster is opened once per process and shared across files
     try:
-        aer = rio.open(aerPath, mode="r")
+        aer = get_areoid(aerPath)
 
     except:
         print("Unable to open areoid file. Is it located at : " + aerPath + " ?")
@@ -505,25 +466,14 @@ def getnav_sharad(navfile, navcrs, body):
 
     try:
         # transform MRO lon/lat to areoid x/y to sample areoid radius along SC path 
-        xformer = get_xformer(navcrs, aer.crs.to_proj4())
+        xformer = get_xformer(navcrs, aer.crs)
         aerX, aerY = xformer.transform(
             df["lon"].to_numpy(),
             df["lat"].to_numpy()
         )
 
-        # get raster x/y index of SC x/y positions
-        inds = [aer.index(x,y) for (x,y) in zip(aerX,aerX)]
-        ix = np.asarray([tup[0] for tup in inds])
-        iy = np.asarray([tup[1] for tup in inds])
-
-        # there seems to be a rasterio indexing error where value may exceed axis bounds when a track is pole-crossing
-        # subtracting one from the index value seems to resolve this
-        ix[ix > aer.width - 1] = aer.width - 1
-        ix[ix < 0] = 0
-        iy[iy > aer.height - 1] = aer.height - 1
-        iy[iy < 0] = 0
-
-        aerZ = aer.read(1)[ix,iy]
+        # sample areoid along SC path, reading only the raster window spanned by the track
+        aerZ = aer.sample(aerX, aerY)
 
         # reference sc elevation to areoid height  = scRad - (3396km + aerZ)
         df["elev"] = (1000.0*df["scRad"]) - 3396000.0 - aerZ
@@ -8,9 +8,24 @@ from ragu.tools import utils
 from ragu.radar.flags import flags
 from ragu.radar.pick import pick
 from ragu.radar.processing import proc
+from ragu.radar.journal import journal
+from ragu.radar.pyramid import pyramid
 from ragu.raguError import raguError
 import numpy as np
 import scipy.signal as signal
+import os, tempfile
+
+#: str, session floating point precision of processed data ("float32" or "float64")
+precision = "float64"
+
+# set_precision sets the session floating point precision for all subsequently loaded datasets
+def set_precision(prec="float64"):
+    global precision
+    if np.dtype(prec) not in (np.float32, np.float64):
+        raise raguError("Unsupported precision: {} - must be float32 or float64".format(prec))
+    precision = np.dtype(prec).name
+    return
+
 
 class garlic(object):
     """
@@ -32,7 +47,7 @@ class garlic(object):
                         "navdf",
                         "truncs"]
     # import processing tools
-    from ragu.radar.processing import reverse, set_tzero, tzero_shift, flatten, vertical_roll, tpowGain, filter, hilbertxform, removeSlidingMeanFFT, restack, undo, redo, reset
+    from ragu.radar.processing import reverse, set_tzero, tzero_shift, flatten, unflatten, vertical_roll, tpowGain, filter, hilbertxform, removeSlidingMeanFFT, restack, dewow, agcGain, undo, redo, reset
 
     def __init__(self, fpath):
         # basic data file attributes
@@ -63,13 +78,17 @@ class garlic(object):
         #: np.ndarray(snum x tnum), raw ingested radar data
         self.dat = None
         #: radar data processing class object
-        self.proc = proc()
-        #: np.ndarray(snum x tnum), dB"d radar data pyramids
-        self.dPyramid = None
+        self.proc = proc(self.dBscale)
+        #: processing journal object for undo/redo
+        self.journal = journal()
+        #: (np.ndarray, pyramid), dB"d radar data pyramid and the dB array it was generated from
+        self._dPyramid = (None, None)
+        #: np.ndarray(snum x tnum), clutter simulation amplitude
+        self._simAmp = None
         #: np.ndarray(snum x tnum), dB"d clutter simulation
-        self.sim = None
-        #: np.ndarray(snum x tnum), dB"s clutter simulation pyramids
-        self.sPyramid = None
+        self._sim = None
+        #: pyramid, dB"d clutter simulation pyramid
+        self._sPyramid = None
         #: radar flags object
         self.flags = flags()
         # geographic crs string
@@ -78,6 +97,8 @@ class garlic(object):
         self.xyzcrs = None
         # bool: store data as power in decibels
         self.dbit = True
+        #: numpy dtype, floating point precision of processed data products - complex data is kept at the matching complex precision
+        self.prec = np.dtype(precision)
 
         # per-trace attributes
         #: navigation dataframe consisting of [lon, lat, hgt, x, y, z, dist], where each field is of type and size np.ndarray(tnum,)
@@ -92,15 +113,28 @@ class garlic(object):
         self.hist = []
         #: np.ndarray(tnum,), surface elevation per trace
         self.srfElev = None
+        #: ingest_pulseekko.TraceHeaders, per-trace header fields as read from a pulseEKKO DT1 file, in ingested trace order
+        self.traceheaders = None
         #: pick object
         self.pick = pick()
         #: pandas dataframe output data
         self.out = None
+        #: dict, cached arrays derived from the raw radar data (magnitude, power, real part)
+        self._derived = {}
+        #: dict, scratch file paths backing derived arrays, keyed as _derived
+        self._scratch = {}
+        #: str, session scratch directory in which to memory map derived data arrays, set when an ingest cache directory is configured - held in memory if None
+        self.derivedDir = None
         return
 
 
-    # set radar data
+    # set radar data - floating point data wider than session precision is cast down
     def set_dat(self,dat):
+        if np.issubdtype(dat.dtype, np.inexact):
+            dat = self.to_prec(dat)
+        # derived arrays are stale once the raw data changes
+        if dat is not self.dat:
+            self.clear_derived()
         self.dat = dat
 
 
@@ -109,27 +143,122 @@ class garlic(object):
         return self.dat
 
 
+    # get cached array derived from the raw radar data, computing it on first access
+    def get_derived(self, key, func):
+        if (key not in self._derived) or (self._derived[key][0] is not self.dat):
+            arr = func(self.dat)
+            fpath = None
+            if self.derivedDir and isinstance(arr, np.ndarray) and arr.ndim == 2 and arr.flags.owndata:
+                # back large derived arrays with a scratch file - views of the raw data hold no memory of their own
+                # each array gets its own file, so arrays still held elsewhere (e.g. undo checkpoints) are never overwritten
+                fd, fpath = tempfile.mkstemp(prefix="{}_{}_".format(self.fn, key), suffix=".npy", dir=self.derivedDir)
+                os.close(fd)
+                mm = np.lib.format.open_memmap(fpath, mode="w+", dtype=arr.dtype, shape=arr.shape)
+                mm[:] = arr
+                del arr
+                arr = mm
+            self.drop_derived(key)
+            self._derived[key] = (self.dat, arr)
+            if fpath is not None:
+                self._scratch[key] = fpath
+        return self._derived[key][1]
+
+
+    # drop cached derived array, removing its scratch file - open memory maps of the file stay valid until released
+    def drop_derived(self, key):
+        self._derived.pop(key, None)
+        fpath = self._scratch.pop(key, None)
+        if fpath is not None:
+            try:
+                os.remove(fpath)
+            except OSError:
+                pass
+
+
+    def clear_derived(self):
+        for key in list(self._derived):
+            self.drop_derived(key)
+
+
+    # magnitude of raw radar data
+    def get_mag(self):
+        return self.get_derived("mag", lambda dat: self.to_prec(np.abs(dat)))
+
+
+    # power of raw radar data
+    def get_pow(self):
+        return self.get_derived("pow", lambda dat: np.square(self.get_mag()))
+
+
+    # real part of raw radar data - a view for complex data, the data itself otherwise
+    def get_real(self):
+        return self.get_derived("real", np.real)
+
+
+    # whether raw radar data holds non-zero imaginary components
+    def is_complex(self):
+        return self.get_derived("complex", lambda dat: bool(np.iscomplexobj(dat) and np.any(dat.imag)))
+
+
     # set processed radar data method
     def set_proc(self, dat):
-        self.proc.set_curr_amp(dat)
-        # dB it
-        self.proc.set_curr_dB(self.dBscale(self.proc.curr_amp))
-        # generate pyramid arrays
-        self.dPyramid = self.genPyramids(self.proc.get_curr_dB())
+        # dB data and pyramid arrays are generated from the new amplitude on first access - drop the stale pyramid and its display cache
+        self.proc.set_curr_amp(self.to_prec(dat))
+        self._dPyramid = (None, None)
         return
 
 
+    # cast array to session precision - integer data and floating point data wider than session precision are cast, narrower data is left as is
+    def to_prec(self, dat):
+        dtype = np.result_type(self.prec, np.complex64) if np.iscomplexobj(dat) else self.prec
+        if np.issubdtype(dat.dtype, np.inexact) and (dat.dtype.itemsize <= dtype.itemsize):
+            return dat
+        return dat.astype(dtype)
+
+
     # set simter simulation data method
     def set_sim(self, dat):
-        # dB it
-        self.sim = self.dBscale(dat)
-        # generate pyramid arrays
-        self.sPyramid = self.genPyramids(self.sim)
+        # dB data and pyramid arrays are generated on first access
+        self._simAmp = dat
+        self._sim = None
+        self._sPyramid = None
         # set sim flag to True
         self.flags.sim = True
         return
 
 
+    # get clutter simulation amplitude
+    def get_sim_amp(self):
+        return self._simAmp
+
+
+    # dB"d clutter simulation
+    @property
+    def sim(self):
+        if self._sim is None and self._simAmp is not None:
+            self._sim = self.dBscale(self._simAmp)
+        return self._sim
+
+
+    # dB"d radar data pyramid, regenerated when the processed dB data changes
+    @property
+    def dPyramid(self):
+        dB = self.proc.get_curr_dB()
+        if dB is None:
+            return None
+        if self._dPyramid[0] is not dB:
+            self._dPyramid = (dB, self.genPyramids(dB))
+        return self._dPyramid[1]
+
+
+    # dB"d clutter simulation pyramid
+    @property
+    def sPyramid(self):
+        if self._sPyramid is None and self.sim is not None:
+            self._sPyramid = self.genPyramids(self.sim)
+        return self._sPyramid
+
+
     # set twtt array
     def set_twtt(self, arr = None):
         if arr is not None:
@@ -175,7 +304,7 @@ class garlic(object):
     def dBscale(self, dat):
         if self.dbit:
             # convert to power
-            pow = np.power(dat.astype(float), 2)
+            pow = np.power(dat.astype(self.prec), 2)
             # mask zero-power values
             pow[pow == 0] = np.nan
             # dB it
@@ -185,22 +314,21 @@ class garlic(object):
         return out
 
 
+    # build display pyramid of dB data, downsampled along both samples and traces
     def genPyramids(self, dat):
-        # downsample in fast time by 2^0, 2^1, 2^2, 2^3
-        pyramid = []
-        # add pyramid arrays to list
-        if (self.dtype == "oibak") or (self.dtype == "cresis_snow") or (self.dtype == "cresis_rds"):
-            for i in range(4):
-                pyramid.append(dat[::2**i,:])
-        else:
-            pyramid.append(dat)
-        return pyramid
+        return pyramid(dat)
 
 
     # append previous command to log
     def log(self, cmd=None):
         if cmd and isinstance(cmd,str):
+            # replayed steps are already logged
+            if self.journal.replaying:
+                return
             self.hist.append(cmd)
+            # checkpoint processing state once ingest has been logged
+            if len(self.hist) >= 2:
+                self.journal.push(self)
 
 
     def check_attrs(self):
@@ -13,4 +13,6 @@ class flags(object):
         #: sampzero, zero sample data setting following time zero adjustment, or radar data flattening
         self.sampzero = 0
         #: sim, bool clutter simulation present
-        self.sim = False
\ No newline at end of file
+        self.sim = False
+        #: reversed, bool trace order reversed relative to the ingested data - picks follow the current trace order
+        self.reversed = False
\ No newline at end of file
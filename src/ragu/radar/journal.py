@@ -0,0 +1,264 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+rdata processing journal for multi-level undo/redo
+"""
+### imports ###
+from ragu.radar.processing import shift_traces
+import numpy as np
+import os, shutil, tempfile
+
+class journal(object):
+    """
+    journal keeps a bounded stack of processing checkpoints for undo/redo.
+    each checkpoint holds the processed amplitude and trace state after a logged step, keyed by the length of garlic.hist.
+    once in-memory checkpoints exceed membudget, the oldest are spilled to memory mapped scratch files,
+    and once spilled checkpoints exceed diskbudget the oldest are dropped - those steps are recomputed
+    by replaying garlic.hist from the nearest earlier checkpoint. the first (ingest) checkpoint is never dropped.
+    the checkpoint before a flatten keeps only the per-trace shifts and the air samples flatten shifted out of the array -
+    its amplitude is rebuilt by unflattening the checkpoint after it, so undoing a flatten needs no stored full copy.
+    processing state only is journaled - picks are left as they are, other than being flipped to follow the trace order
+    when an undo or redo changes whether the radargram is reversed.
+    undo and redo only update the history, checkpoints and redo stack once the restored state has been computed -
+    if restoring fails or is cancelled, the previous processing state is put back.
+    """
+    # garlic attributes saved with each checkpoint
+    state_attrs = ["dat", "snum", "tnum", "navdf", "asep", "srfElev"]
+
+    def __init__(self, membudget=1e9, diskbudget=4e9, scratchdir=None):
+        #: float, bytes of in-memory checkpoint data to hold before spilling to disk
+        self.membudget = membudget
+        #: float, bytes of spilled checkpoint data to hold before dropping checkpoints
+        self.diskbudget = diskbudget
+        #: str, parent directory for scratch files (system temp directory if None)
+        self.scratchdir = scratchdir
+        #: dict, checkpoints keyed by garlic.hist length
+        self.checkpoints = {}
+        #: list, (hist entry, checkpoint) pairs which have been undone
+        self.redo_stack = []
+        #: bool, True while replaying logged steps
+        self.replaying = False
+        #: bool, record checkpoints - disabled for headless processing where undo is not needed
+        self.enabled = True
+        self._tmpdir = None
+        self._count = 0
+
+
+    # record a checkpoint of the current processing state
+    def push(self, rdata, clear_redo=True):
+        if (not self.enabled) or (rdata.proc.get_curr_amp() is None):
+            return
+        self.checkpoints[len(rdata.hist)] = self.snapshot(rdata)
+        if clear_redo:
+            self.clear_redo()
+        self.compact(rdata, len(rdata.hist) - 1)
+        self.enforce(rdata)
+
+
+    # current processing state, holding references to its arrays
+    def snapshot(self, rdata):
+        cp = {"amp": rdata.proc.get_curr_amp(),
+              "sampzero": rdata.flags.sampzero,
+              "reversed": rdata.flags.reversed,
+              "simAmp": rdata.get_sim_amp()}
+        for attr in self.state_attrs:
+            cp[attr] = getattr(rdata, attr)
+        return cp
+
+
+    # set processing state from a checkpoint
+    def apply(self, rdata, cp):
+        for attr in self.state_attrs:
+            if (attr == "srfElev") and (cp[attr] is None):
+                continue
+            setattr(rdata, attr, cp[attr])
+        rdata.flags.sampzero = cp["sampzero"]
+        rdata.flags.reversed = cp["reversed"]
+        if cp["simAmp"] is not rdata.get_sim_amp():
+            rdata.set_sim(cp["simAmp"])
+        # bring spilled data back into memory
+        amp = np.array(cp["amp"]) if "scratch" in cp else cp["amp"]
+        rdata.set_proc(amp)
+
+
+    # ids of arrays held by garlic itself, which checkpoints referencing them add nothing to
+    def live(self, rdata):
+        return [id(rdata.proc.get_curr_amp()), id(rdata.dat)] + [id(v[1]) for v in rdata._derived.values()]
+
+
+    # samples of each trace which a flatten by shift moves out of the array
+    def lost(self, snum, shift):
+        i = np.arange(snum)[:, np.newaxis]
+        shift = np.asarray(shift)[np.newaxis, :]
+        return (i < shift) | (i >= snum + shift)
+
+
+    # reduce the checkpoint before a flatten step to its shifts and the air samples flatten removed
+    def compact(self, rdata, key):
+        if (key not in self.checkpoints) or ((key + 1) not in self.checkpoints) or (key == min(self.checkpoints)) or \
+            (len(rdata.hist) <= key) or (rdata.hist[key] != "rdata.flatten()"):
+            return
+        cp = self.checkpoints[key]
+        if ("unflatten" in cp) or (id(cp["amp"]) in self.live(rdata)):
+            return
+        amp = cp["amp"]
+        shift = np.asarray(self.checkpoints[key + 1]["sampzero"])
+        air = np.array(amp[self.lost(amp.shape[0], shift)])
+        self.remove(cp)
+        cp.pop("scratch", None)
+        cp["amp"] = None
+        cp["unflatten"] = (shift, air, amp.dtype)
+
+
+    # rebuild a compacted checkpoint by unflattening the checkpoint after it and filling in the air samples
+    def expand(self, cp, nxt):
+        shift, air, dtype = cp["unflatten"]
+        amp = shift_traces(np.asarray(nxt["amp"]), -shift)
+        amp[self.lost(amp.shape[0], shift)] = air
+        out = dict(cp)
+        del out["unflatten"]
+        out["amp"] = amp.astype(dtype, copy=False)
+        return out
+
+
+    # spill or drop old checkpoints to stay within memory and disk budgets
+    def enforce(self, rdata):
+        keys = [k for k in sorted(self.checkpoints) if "unflatten" not in self.checkpoints[k]]
+        live = self.live(rdata)
+        mem = [k for k in keys if not isinstance(self.checkpoints[k]["amp"], np.memmap) and id(self.checkpoints[k]["amp"]) not in live]
+        while mem and self.nbytes(mem) > self.membudget:
+            self.spill(mem.pop(0))
+        disk = [k for k in keys if (k != min(self.checkpoints)) and ("scratch" in self.checkpoints[k])]
+        while disk and self.nbytes(disk) > self.diskbudget:
+            self.drop(disk.pop(0))
+
+
+    def nbytes(self, keys):
+        return sum(self.checkpoints[k]["amp"].nbytes for k in keys if self.checkpoints[k]["amp"] is not None)
+
+
+    # write checkpoint amplitude to a memory mapped scratch file
+    def spill(self, key):
+        cp = self.checkpoints[key]
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="ragu_journal_", dir=self.scratchdir)
+        self._count += 1
+        fpath = os.path.join(self._tmpdir, "{}.npy".format(self._count))
+        out = np.lib.format.open_memmap(fpath, mode="w+", dtype=cp["amp"].dtype, shape=cp["amp"].shape)
+        out[:] = cp["amp"]
+        out.flush()
+        del out
+        cp["amp"] = np.load(fpath, mmap_mode="r")
+        cp["scratch"] = fpath
+
+
+    # drop a checkpoint, and the compacted checkpoint before it which is rebuilt from it
+    def drop(self, key):
+        self.remove(self.checkpoints.pop(key))
+        if "unflatten" in self.checkpoints.get(key - 1, {}):
+            self.checkpoints.pop(key - 1)
+
+
+    # remove checkpoint scratch file
+    def remove(self, cp):
+        if (cp is not None) and ("scratch" in cp):
+            cp["amp"] = None
+            try:
+                os.remove(cp["scratch"])
+            except OSError:
+                pass
+
+
+    def clear_redo(self):
+        for cmd, cp in self.redo_stack:
+            self.remove(cp)
+        self.redo_stack = []
+
+
+    # drop all checkpoints after hist length n
+    def truncate(self, n):
+        for key in [k for k in self.checkpoints if k > n]:
+            self.drop(key)
+
+
+    # restore processing state after the first n steps of hist, replaying logged steps from the nearest checkpoint at or before n
+    # cps optionally overrides the checkpoints to restore from. returns the key of the checkpoint restored from
+    def restore(self, rdata, n, hist, cps=None):
+        cps = self.checkpoints if cps is None else cps
+        key = max(k for k in cps if (k <= n) and (("unflatten" not in cps[k]) or ((k + 1) in cps)))
+        before = self.snapshot(rdata)
+        cp = cps[key]
+        try:
+            if "unflatten" in cp:
+                cp = self.expand(cp, cps[key + 1])
+            self.apply(rdata, cp)
+            if key < n:
+                self.replay(rdata, hist[key:n])
+        except BaseException:
+            self.apply(rdata, before)
+            raise
+        # a rebuilt checkpoint keeps its amplitude once restored, as garlic now holds it anyway
+        if (cp is not cps[key]) and (self.checkpoints.get(key) is cps[key]):
+            self.checkpoints[key] = cp
+        # picks follow the trace order
+        if rdata.flags.reversed != before["reversed"]:
+            for h in rdata.pick.horizons.keys():
+                rdata.pick.horizons[h] = np.flip(rdata.pick.horizons[h])
+        return key
+
+
+    # re-run logged processing steps without logging them again
+    def replay(self, rdata, steps):
+        self.replaying = True
+        try:
+            for cmd in steps:
+                exec(cmd, {"rdata": rdata, "np": np})
+        finally:
+            self.replaying = False
+
+
+    def undo(self, rdata):
+        n = len(rdata.hist)
+        key = self.restore(rdata, n - 1, rdata.hist)
+        self.redo_stack.append((rdata.hist[-1], self.checkpoints.pop(n, None)))
+        del rdata.hist[-1]
+        if key < n - 1:
+            self.push(rdata, clear_redo=False)
+
+
+    def redo(self, rdata):
+        cmd, cp = self.redo_stack[-1]
+        hist = rdata.hist + [cmd]
+        cps = dict(self.checkpoints)
+        if cp is not None:
+            cps[len(hist)] = cp
+        key = self.restore(rdata, len(hist), hist, cps)
+        self.redo_stack.pop()
+        rdata.hist.append(cmd)
+        if cp is not None:
+            self.checkpoints[len(hist)] = cp
+            self.compact(rdata, len(hist) - 1)
+        elif key < len(hist):
+            self.push(rdata, clear_redo=False)
+
+
+    # clear journal and rebase on the current processing state
+    def reset(self, rdata):
+        self.truncate(-1)
+        self.push(rdata)
+
+
+    # remove scratch files
+    def close(self):
+        self.truncate(-1)
+        self.clear_redo()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+
+    def __del__(self):
+        self.close()
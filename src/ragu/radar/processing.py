@@ -7,59 +7,59 @@
 RAGU radar data processing class and tools
 """
 ### imports ###
-from ragu.tools import utils
+from ragu.tools import utils, tasks
 from ragu.nav import navparse
-import pyproj
 import numpy as np
 import pandas as pd
-import numpy.matlib as matlib
 import matplotlib.pyplot as plt
 import scipy.interpolate as interp
 import scipy.signal as signal
+import scipy.fft as sp_fft
+import scipy.ndimage as ndimage
 
 class proc(object):
-    def __init__(self):
-        #: np.ndarray(snum x tnum), previously processed radar data (amp)
-        self.prev_amp = None
-        #: np.ndarray(snum x tnum), previously processed radar data (dB)
-        self.prev_dB = None
+    """
+    proc holds the current processed radar data amplitude array - earlier processing states are kept by the undo journal.
+    dB arrays are derived lazily from the amplitude on first access and cached with the amplitude array they were derived from,
+    so a dB array computed while the amplitude is replaced on another thread is never served for the new amplitude.
+    """
+    def __init__(self, dBscale=None):
         #: np.ndarray(snum x tnum), current processed radar data (amp)
         self.curr_amp = None
-        #: np.ndarray(snum x tnum), current processed radar data (dB)
-        self.curr_dB = None
-
-    def set_prev_amp(self, amp):
-        self.prev_amp = amp
-
-    def get_prev_amp(self):
-        return self.prev_amp
-
-    def set_prev_dB(self, dB):
-        self.prev_dB = dB
-
-    def get_prev_dB(self):
-        return self.prev_dB
+        #: (np.ndarray, np.ndarray), current processed radar data (dB) and the amplitude array it was derived from, cached
+        self._curr_dB = (None, None)
+        #: function, amplitude to dB conversion
+        self.dBscale = dBscale if dBscale is not None else utils.amp2powdB
 
     def set_curr_amp(self, amp):
+        if amp is not self.curr_amp:
+            self._curr_dB = (None, None)
         self.curr_amp = amp
 
     def get_curr_amp(self):
         return self.curr_amp
 
     def set_curr_dB(self, dB):
-        self.curr_dB = dB
+        self._curr_dB = (self.curr_amp, dB)
 
     def get_curr_dB(self):
-        return self.curr_dB
+        amp = self.curr_amp
+        if amp is None:
+            return None
+        if self._curr_dB[0] is not amp:
+            self._curr_dB = (amp, self.dBscale(amp))
+        return self._curr_dB[1]
+
+    curr_dB = property(get_curr_dB, set_curr_dB)
 
 
 def set_tzero(self):
     # get mean trace and find max sample and update sampzero flag
     if self.info["Signal Type"] == "Chirp":
-        meanTrace = np.nanmean(np.abs(self.dat), axis=1)
+        meanTrace = np.nanmean(self.get_mag(), axis=1)
         self.flags.sampzero = np.nanargmax(meanTrace)
     elif self.info["Signal Type"] == "Impulse":
-        self.flags.sampzero = np.nanmean(utils.get_srf(np.abs(self.dat), "Impulse")).astype(int)
+        self.flags.sampzero = np.nanmean(utils.get_srf(self.get_mag(), "Impulse")).astype(int)
 
     if self.flags.sampzero > 0:
         self.tzero_shift()
@@ -75,8 +75,6 @@ def set_tzero(self):
 def tzero_shift(self):
     # shift 2d proc data array so first row is time zero sample - use nan to fill bottom samples
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
     out = np.zeros_like(amp)
     out[:-self.flags.sampzero,:] = amp[self.flags.sampzero:,:]
     out[-self.flags.sampzero:,:] = np.nan
@@ -92,37 +90,52 @@ def reverse(self):
 
     # need to flip all relevant arrays - nav, picks, clutter
     if self.flags.sim:
-        self.set_sim(utils.powdB2amp(self.sim)[:,::-1])
+        self.set_sim(self.get_sim_amp()[:,::-1])
 
     # flip navdf and recalculate distance array
     self.navdf = self.navdf.iloc[::-1].reset_index(drop=True)
     self.navdf.dist = navparse.euclid_dist(self.navdf.x.to_numpy(), self.navdf.y.to_numpy(), self.navdf.z.to_numpy())
 
-    # reverse picks
-    for h in self.pick.horizons.keys():
-        self.pick.horizons[h] = np.flip(self.pick.horizons[h])
+    # reverse picks - picks are not journaled, so when replaying the journal flips them once the restored trace order is known
+    self.flags.reversed = not self.flags.reversed
+    if not self.journal.replaying:
+        for h in self.pick.horizons.keys():
+            self.pick.horizons[h] = np.flip(self.pick.horizons[h])
 
     # log
-    self.log("rdata.rgram_reverse()")
+    self.log("rdata.reverse()")
     print("# radargram reversed, to undo simply repeat reverse operation")
 
     return
 
+def shift_traces(amp, shift):
+    """
+    shift each trace of a radargram vertically in a single gather
+    INPUT:
+    amp         (snum x tnum) data array
+    shift       (tnum,) integer samples to shift each trace up by (negative shifts down)
+
+    OUTPUT:
+    out         (snum x tnum) shifted data array, samples shifted in from outside the array are nan
+    """
+    if not np.issubdtype(amp.dtype, np.inexact):
+        amp = amp.astype(float)
+    idx = np.arange(amp.shape[0])[:, np.newaxis] + np.asarray(shift)[np.newaxis, :]
+    valid = (idx >= 0) & (idx < amp.shape[0])
+    out = np.take_along_axis(amp, np.where(valid, idx, 0), axis=0)
+    out[~valid] = np.nan
+    return out
+
+
 def flatten(self):
     # flatten radargram by rolling each trace so that the surface is at sample zero
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
-    # initialize output array
-    out = np.zeros_like(amp.T)
-    # get surf samples in integer form for rolling
+    # get surf samples in integer form for shifting
     self.flags.sampzero = self.pick.horizons[self.pick.get_srf()].astype(int)
-    # loop through all traces and roll according to surface sample
-    for i, col in enumerate(amp.T):
-        out[i] = np.roll(col, shift = -self.flags.sampzero[i])
-        out[i][-self.flags.sampzero[i]:] = np.nan             # set prior air samples to nan?
+    # shift all traces so surface sample is at zero, prior air samples set to nan
+    out = shift_traces(amp, self.flags.sampzero)
 
-    self.set_proc(out.T)
+    self.set_proc(out)
 
     # log
     self.log("rdata.flatten()")
@@ -131,11 +144,26 @@ def flatten(self):
     return
 
 
+def unflatten(self):
+    # inverse of flatten - shift each trace back down by its surface sample, air samples removed by flatten are nan
+    if np.ndim(self.flags.sampzero) == 0:
+        return
+    amp = self.proc.get_curr_amp()
+    out = shift_traces(amp, -self.flags.sampzero)
+    self.flags.sampzero = 0
+
+    self.set_proc(out)
+
+    # log
+    self.log("rdata.unflatten()")
+    print("# data array unflattened ")
+
+    return
+
+
 def vertical_roll(self, samples=0):
     # roll 2d proc data array vertically to fix mismatch
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
     out = np.roll(amp, shift=samples, axis=0)
     self.set_proc(out)
 
@@ -146,40 +174,39 @@ def vertical_roll(self, samples=0):
     return
 
 
-def removeSlidingMeanFFT(self, window):
-    # background noise removal using sliding mean in frequency space
-    amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
-
-    # window in interval to avg over for mean removal
-    mean = np.zeros(amp.shape)
-    a = np.zeros(amp.shape[1])
-    a[0 : window // 2] = 1
-    a[amp.shape[1] - window // 2 : amp.shape[1]] = 1
-    A = np.fft.fft(a)
-
-    # Main circular convolution
-    for i in range(amp.shape[0]):
-        T = np.fft.fft(amp[i, :])
-        mean[i, :] = np.real(np.fft.ifft(np.multiply(T, A)) / window)
-
-    # Handle edges
-    mt = np.zeros(amp.shape[0])
-    for i in range(0, window):
-        mt = np.add(mt, np.divide(amp[:, i], window))
+def sliding_mean(amp, window, block=512):
+    """
+    along-track sliding mean of a radargram, computed from cumulative sums over blocks of rows
+    INPUT:
+    amp         (snum x tnum) data array
+    window      number of traces to average over
+    block       number of rows summed at a time, bounds the double precision scratch array
 
-    for i in range(0, window // 2):
-        mean[:, i] = mt
+    OUTPUT:
+    mean        (snum x tnum) sliding mean, with the mean of the first/last window traces held across each edge
+    """
+    snum, tnum = amp.shape
+    half = window // 2
+    dtype = amp.dtype if np.issubdtype(amp.dtype, np.inexact) else np.float64
+    mean = np.empty((snum, tnum), dtype=dtype)
+    for r in range(0, snum, block):
+        # accumulate in double precision to avoid drift along long tracks
+        csum = np.zeros((min(block, snum - r), tnum + 1), dtype=np.result_type(amp.dtype, np.float64))
+        np.cumsum(amp[r:r + block], axis=1, out=csum[:, 1:])
+        # interior - sum of traces j-half+1 through j+half
+        mean[r:r + block, half:tnum - half] = (csum[:, 2*half + 1:] - csum[:, 1:tnum - 2*half + 1]) / window
+        # edges - mean of first/last window traces
+        mean[r:r + block, :half] = (csum[:, [window]] / window)
+        mean[r:r + block, tnum - half:] = ((csum[:, [tnum]] - csum[:, [tnum - window]]) / window)
+        tasks.checkpoint(min(r + block, snum) / snum)
+    return mean
 
-    mt = np.zeros(amp.shape[0])
-    for i in range(amp.shape[1] - window, amp.shape[1]):
-        mt = np.add(mt, np.divide(amp[:, i], window))
 
-    for i in range(amp.shape[1] - window // 2, amp.shape[1]):
-        mean[:, i] = mt
+def removeSlidingMeanFFT(self, window):
+    # background noise removal using sliding mean
+    amp = self.proc.get_curr_amp()
 
-    out = np.subtract(amp, mean)
+    out = np.subtract(amp, sliding_mean(amp, window))
     self.set_proc(out)
     # log
     self.log("rdata.removeSlidingMeanFFT(window={})".format(window))
@@ -188,7 +215,7 @@ def removeSlidingMeanFFT(self, window):
     return 
 
 
-def butter(btype="lowpass", lowcut=None, highcut=None, fs=None, order=5):
+def butter(btype="lowpass", lowcut=None, highcut=None, fs=None, order=5, output="ba"):
     nyq = 0.5 * fs
     cutoff = []
     if btype=="lowpass" and highcut > 0:
@@ -201,21 +228,116 @@ def butter(btype="lowpass", lowcut=None, highcut=None, fs=None, order=5):
     else:
         raise ValueError("Critical frequency error: Lowcut={}, Highcut={}".format(lowcut, highcut))
         return
-    b, a = signal.butter(order, cutoff, btype=btype)
+    # scalar critical frequency for lowpass/highpass
+    if len(cutoff) == 1:
+        cutoff = cutoff[0]
+
+    return signal.butter(order, cutoff, btype=btype, output=output)
 
-    return b, a
+
+def sosfiltfilt_nan(sos, arr, axis=0, workers=None, block=256):
+    """
+    zero-phase filter each trace (axis=0) or each sample row (axis=1) of a 2d or 3d (snum x tnum x nchan) array with second-order sections.
+    contiguous runs of non-nan data are filtered separately, so nan gaps remain nan without sentinel values.
+    blocks of lines are filtered across a thread pool, scipy releases the gil while filtering.
+    INPUT:
+    sos         second-order sections filter coefficients
+    arr         data array, left unmodified - complex data is filtered as amplitude
+    axis        axis to filter along
+    workers     number of threads (default = cpu count)
+    block       number of lines per thread task
+
+    OUTPUT:
+    out         filtered array, same precision as the input amplitude
+    """
+    # gather every line along the filter axis into the rows of a 2d block
+    shape = np.moveaxis(arr, axis, -1).shape
+    lines = np.moveaxis(arr, axis, -1).reshape(-1, shape[-1])
+    dtype = np.abs(np.zeros(1, dtype=arr.dtype)).dtype
+    out = np.empty(lines.shape, dtype=dtype)
+    # default sosfiltfilt pad length
+    padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+
+    def filt(x):
+        # filter a 2d block of lines along axis 1, pad length limited by line length
+        if x.shape[1] < 2:
+            return x
+        return signal.sosfiltfilt(sos, x, axis=1, padlen=min(padlen, x.shape[1] - 1))
+
+    def run(start):
+        x = np.abs(lines[start:start + block])
+        nan = np.isnan(x)
+        clean = ~nan.any(axis=1)
+        if clean.all():
+            out[start:start + block] = filt(x)
+            return
+        res = np.full(x.shape, np.nan)
+        res[clean] = filt(x[clean])
+        # group remaining lines by their non-nan segments and filter each segment as a batch
+        groups = {}
+        for i in np.where(~clean)[0]:
+            segs = tuple((seg.start, seg.stop) for seg in np.ma.clump_unmasked(np.ma.masked_array(x[i], nan[i])))
+            groups.setdefault(segs, []).append(i)
+        for segs, idx in groups.items():
+            for (i0, i1) in segs:
+                res[idx, i0:i1] = filt(x[idx, i0:i1])
+        out[start:start + block] = res
+
+    tasks.pmap(run, range(0, lines.shape[0], block), workers)
+
+    return np.moveaxis(out.reshape(shape), -1, axis)
+
+
+def hilbert_envelope(arr, dtype=None, workers=None, block=256):
+    """
+    amplitude envelope of each trace (column) of a 2d or 3d array, from the analytic signal.
+    traces are zero padded to an fft friendly length and transformed with rfft in blocks of columns across a thread pool,
+    so the complex intermediate is only ever held for one block per thread.
+    INPUT:
+    arr         (snum x tnum) or (snum x tnum x nchan) real data array, nan samples are treated as zero and remain nan in the output
+    dtype       output precision (default = input precision)
+    workers     number of threads (default = cpu count)
+    block       number of traces per thread task
+
+    OUTPUT:
+    out         envelope magnitude, same shape as arr
+    """
+    # channels of 3d data are transformed as additional columns
+    shape = arr.shape
+    arr = arr.reshape(shape[0], -1)
+    snum, tnum = arr.shape
+    dtype = dtype or (arr.dtype if np.issubdtype(arr.dtype, np.floating) else np.float64)
+    out = np.empty((snum, tnum), dtype=dtype)
+    nfft = sp_fft.next_fast_len(snum, real=True)
+    # analytic signal weights for the non-negative frequency bins
+    h = np.zeros(nfft // 2 + 1)
+    h[0] = 1
+    h[1:(nfft + 1) // 2] = 2
+    if nfft % 2 == 0:
+        h[-1] = 1
+
+    def run(start):
+        x = arr[:, start:start + block]
+        nan = np.isnan(x)
+        X = sp_fft.rfft(np.where(nan, 0, x), n=nfft, axis=0)
+        X *= h[:, np.newaxis]
+        env = np.abs(sp_fft.ifft(X, n=nfft, axis=0)[:snum])
+        env[nan] = np.nan
+        out[:, start:start + block] = env
+
+    tasks.pmap(run, range(0, tnum, block), workers)
+
+    return out.reshape(shape)
 
 
 def hilbertxform(self):
+    # replace data with the amplitude envelope of each trace
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
-    analytic_signal = signal.hilbert(amp, axis=0)
-    amplitude_envelope = np.abs(analytic_signal)
+    amplitude_envelope = hilbert_envelope(amp, dtype=self.prec)
     self.set_proc(amplitude_envelope)
     # log
     self.log("rdata.hilbertxform()")
-    print("# hilbert transform applied applied")
+    print("# hilbert transform applied")
 
     return 
 
@@ -223,24 +345,13 @@ def hilbertxform(self):
 def filter(self, btype="lowpass", lowcut=None, highcut=None, order=5, direction=0):
     # apply low pass filter to data array
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    # use abs value of amp
-    amp = np.abs(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
     if direction == 0:
         fs=1/self.dt
     elif direction == 1:
         fs=self.prf
-    b, a = butter(btype=btype, lowcut=lowcut, highcut=highcut, fs=fs, order=order)
-    # avoid scipy filter nan issues by windowing out any time zero shift
-    out = np.zeros_like(amp)
-    # get indices of any nans and temporarily replace
-    idx = np.where(np.isnan(amp))
-    amp[idx] = -9999
-    out = signal.filtfilt(b, a, amp, axis=direction)
-    out[idx] = np.nan
-    # out[:-self.flags.sampzero,:] = signal.filtfilt(b, a, np.abs(amp[:-self.flags.sampzero:,:]), axis=direction)
-    # out[-self.flags.sampzero:,:] = np.nan
+    sos = butter(btype=btype, lowcut=lowcut, highcut=highcut, fs=fs, order=order, output="sos")
+    # filter abs value of amp - nan gaps (e.g. time zero shift) are filtered around, amp is left untouched
+    out = sosfiltfilt_nan(sos, amp, axis=direction)
     # use amplitude of lp filtered data to reset as pc array
     self.set_proc(out)
     # log
@@ -252,11 +363,10 @@ def filter(self, btype="lowpass", lowcut=None, highcut=None, order=5, direction=
 
 def restack(self, intrvl=None,thold=None):
     # get coordinate transformation
-    xform = pyproj.Transformer.from_crs(self.geocrs, self.xyzcrs)
+    xform = navparse.get_xformer(self.geocrs, self.xyzcrs)
 
     # restack radar data to specified along-track distance
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
     navdf = self.navdf.copy()
     # first account for any static traces where there may be gps drift
     if thold > 0:
@@ -274,50 +384,44 @@ def restack(self, intrvl=None,thold=None):
         amp = namp
         # get surface elev
         navdf['srfelev'] = self.srfElev[drift_mask]
+    else:
+        navdf["srfelev"] = self.srfElev
 
     totdist = navdf.dist.iloc[-1]  # Total distance
     ntrace = int(totdist//intrvl)
 
-    rstack = np.zeros((self.snum, ntrace))
-    lat = np.zeros(ntrace)
-    lon = np.zeros(ntrace)
-    hgt = np.zeros(ntrace)
-    srf = np.repeat(np.nan,ntrace)
-    asep = np.repeat(np.nan,ntrace)
-    twtt_wind = np.repeat(np.nan,ntrace)
-
     if "asep" not in navdf.keys():
         navdf["asep"] = self.asep
-        
-    for i in range(ntrace):
-        stack_slice = np.logical_and(navdf.dist > i*intrvl, navdf.dist < (i+1)*intrvl)
-        nstack = np.sum(stack_slice)
-        if(nstack == 0):
-            if i==0:
-                rstack[:, i] = amp[:, i]
-                lat[i] = navdf["lat"][i]
-                lon[i] = navdf["lon"][i]
-                hgt[i] = navdf["elev"][i]
-                srf[i] = navdf["srfelev"][i]
-                twtt_wind[i] = navdf["twtt_wind"][i]
-                asep[i] = navdf["asep"][i]
-            else:
-                rstack[:, i] = rstack[:, i-1]
-                lat[i] = lat[i-1]
-                lon[i] = lon[i-1]
-                hgt[i] = hgt[i-1]
-                srf[i] = srf[i-1]
-                twtt_wind[i] = twtt_wind[i-1]
-                asep[i] = asep[i-1]
-            continue
-
-        rstack[:, i] = np.sum(amp[:, stack_slice], axis=1)/nstack
-        lat[i] = np.mean(navdf["lat"][stack_slice])
-        lon[i] = np.mean(navdf["lon"][stack_slice])
-        hgt[i] = np.mean(navdf["elev"][stack_slice])
-        srf[i] = np.mean(navdf["srfelev"][stack_slice])
-        twtt_wind[i] = np.mean(navdf["twtt_wind"][stack_slice])
-        asep[i] = np.mean(navdf["asep"][stack_slice])
+
+    # assign each trace to an along-track distance bin, dropping traces beyond the last full bin
+    bins = (navdf["dist"].to_numpy() // intrvl).astype(int)
+    valid = np.where(bins < ntrace)[0]
+    valid = valid[np.argsort(bins[valid], kind="stable")]
+    bins = bins[valid]
+    nstack = np.bincount(bins, minlength=ntrace)
+    full = np.where(nstack > 0)[0]
+
+    # sum traces within each occupied bin - traces are contiguous once sorted by bin
+    starts = np.searchsorted(bins, full)
+    stack = np.add.reduceat(amp[:, valid], starts, axis=1) / nstack[full]
+
+    # average nav within each occupied bin, ignoring nans
+    cols = ["lon", "lat", "elev", "srfelev", "twtt_wind", "asep"]
+    navarr = navdf[cols].to_numpy(dtype=float)[valid]
+    nanmask = np.isnan(navarr)
+    navsum = np.add.reduceat(np.where(nanmask, 0, navarr), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        navstack = navsum / np.add.reduceat(~nanmask, starts, axis=0)
+
+    # forward-fill empty bins from the previous occupied bin, leading empty bins take the first trace
+    fill = np.maximum.accumulate(np.where(nstack > 0, np.searchsorted(full, np.arange(ntrace)), -1))
+    lead = fill < 0
+    rstack = stack[:, fill].astype(amp.dtype, copy=False)
+    navout = navstack[fill]
+    if lead.any():
+        rstack[:, lead] = amp[:, [0]]
+        navout[lead] = navdf[cols].to_numpy(dtype=float)[0]
+    lon, lat, hgt, srf, twtt_wind, asep = navout.T
 
     # store updated nav data
     self.navdf = pd.DataFrame()
@@ -344,12 +448,10 @@ def restack(self, intrvl=None,thold=None):
 def tpowGain(self, power):
     # t-power gain to each trace with the given exponent.
     amp = self.proc.get_curr_amp()
-    self.proc.set_prev_amp(amp)
-    self.proc.set_prev_dB(self.proc.get_curr_dB())
     twtt = np.arange(self.snum)*self.dt
-    factor = np.reshape(twtt**(float(power)),(len(twtt),1))
-    factmat = np.matlib.repmat(factor,1,self.tnum)
-    out = np.multiply(amp,factmat)
+    # broadcast gain factor across traces at session precision
+    factor = (twtt**(float(power))).astype(self.prec)[:, np.newaxis]
+    out = np.multiply(amp,factor)
     self.set_proc(out)
     # log
     self.log("rdata.tpowGain(power={})".format(power))
@@ -361,22 +463,17 @@ def tpowGain(self, power):
 def undo(self):
     # undo last processing step
     if len(self.hist) > 2:
-        tmp = self.proc.get_curr_amp()
-        self.set_proc(self.proc.get_prev_amp())
-        self.proc.set_prev_amp(tmp)
-        # clear last log entry
-        self.last = self.hist[-1]
-        del self.hist[-1]
+        self.journal.undo(self)
         print("# last processing step removed")
 
     return
 
 
 def redo(self):
-    tmp = self.proc.get_curr_amp()
-    self.set_proc(self.proc.get_prev_amp())
-    self.proc.set_prev_amp(tmp)
-    self.log(self.last)
+    # redo last undone processing step
+    if self.journal.redo_stack:
+        self.journal.redo(self)
+        print("# processing step restored: " + self.hist[-1].split("\n")[0])
 
     return
 
@@ -384,78 +481,68 @@ def redo(self):
 def reset(self):
     # reset processed data to original
     if self.dtype == "oibak":
-        self.set_proc(np.abs(self.dat))
+        self.set_proc(self.get_mag())
 
     else:
         self.set_proc(self.dat)
 
-    # clear log of all processing
+    # clear log of all processing and rebase undo journal
     del self.hist[2:]
+    self.journal.reset(self)
     
     return
 
 
-### proc functions still in dev ###
+def dewow(self, window):
+    # subtract from each sample along each trace an along-time moving average - acts as a low-cut filter
+    # window is the length of the moving average window in number of samples
+    amp = self.proc.get_curr_amp()
+    snum = amp.shape[0]
+    # if the window is larger than or equal to the number of samples, subtract the mean trace value
+    if window >= snum:
+        out = amp - np.nanmean(amp, axis=0)
+    else:
+        half = int(np.ceil(window/2.0))
+        # running sum and count of valid samples down each trace, accumulated in double precision - nan samples are left out of the mean
+        csum = np.zeros((snum + 1, amp.shape[1]), dtype=np.result_type(amp.dtype, np.float64))
+        np.nancumsum(amp, axis=0, out=csum[1:])
+        cnum = np.zeros((snum + 1, amp.shape[1]), dtype=np.int64)
+        np.cumsum(~np.isnan(amp), axis=0, out=cnum[1:])
+        tot = np.empty(amp.shape, dtype=csum.dtype)
+        num = np.empty(amp.shape, dtype=cnum.dtype)
+        # first samples take the mean of samples 0 through half
+        tot[:half] = csum[half + 1]
+        num[:half] = cnum[half + 1]
+        # middle samples take the centered mean of 2*half+1 samples
+        tot[half:snum - half] = csum[2*half + 1:] - csum[:snum - 2*half]
+        num[half:snum - half] = cnum[2*half + 1:] - cnum[:snum - 2*half]
+        # last samples take the mean of the last half samples
+        tot[snum - half:] = csum[snum] - csum[snum - half]
+        num[snum - half:] = cnum[snum] - cnum[snum - half]
+        # windows holding no valid samples give nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (tot / num).astype(amp.dtype, copy=False)
+        out = amp - mean
 
-def dewow(data,window):
-    """
-    Subtracts from each sample along each trace an 
-    along-time moving average.
+    self.set_proc(out)
+    # log
+    self.log("rdata.dewow(window={})".format(window))
+    print("# dewow applied with a window size of {} samples".format(window))
 
-    Can be used as a low-cut filter.
+    return
 
-    INPUT:
-    data       data matrix whose columns contain the traces 
-    window     length of moving average window 
-            [in "number of samples"]
 
-    OUTPUT:
-    newdata    data matrix after dewow
-    """
-    totsamps = data.shape[0]
-    # If the window is larger or equal to the number of samples,
-    # then we can do a much faster dewow
-    if (window >= totsamps):
-        newdata = data-np.matrix.mean(data,0)            
-    else:
-        newdata = np.asmatrix(np.zeros(data.shape))
-        halfwid = int(np.ceil(window/2.0))
-        
-        # For the first few samples, it will always be the same
-        avgsmp=np.matrix.mean(data[0:halfwid+1,:],0)
-        newdata[0:halfwid+1,:] = data[0:halfwid+1,:]-avgsmp
-
-        # for each sample in the middle
-        for smp in range(halfwid,totsamps-halfwid+1):
-            winstart = int(smp - halfwid)
-            winend = int(smp + halfwid)
-            avgsmp = np.matrix.mean(data[winstart:winend+1,:],0)
-            newdata[smp,:] = data[smp,:]-avgsmp
-
-        # For the last few samples, it will always be the same
-        avgsmp = np.matrix.mean(data[totsamps-halfwid:totsamps+1,:],0)
-        newdata[totsamps-halfwid:totsamps+1,:] = data[totsamps-halfwid:totsamps+1,:]-avgsmp
-        
-    return newdata
-
-
-def agcGain(data, window=50, scaling_factor=50):
-    """Try to do some automatic gain control
-
-    Parameters
-    ----------
-    window: int, optional
-        The size of window we use in number of samples (default 50)
-    scaling_factor: int, optional
-        The scaling factor. This gets divided by the max amplitude when we rescale the input.
-        Default 50.
-    """
-    num_sample = data.shape[1]
-    maxamp = np.zeros((num_sample,))
-    for i in range(num_sample):
-        maxamp[i] = np.max(np.abs(data[max(0, i - window // 2):
-                                            min(i + window // 2, num_sample), :]))
+def agcGain(self, window=50, scaling_factor=50):
+    # automatic gain control - scale each sample by scaling_factor over the maximum amplitude
+    # within a window of samples centered on it along its trace
+    amp = self.proc.get_curr_amp()
+    maxamp = ndimage.maximum_filter1d(np.nan_to_num(np.abs(amp)), size=max(1, 2*(window//2)), axis=0, mode="nearest")
     maxamp[maxamp == 0] = 1.0e-6
-    newdata = data * (scaling_factor / np.atleast_2d(maxamp).transpose()).astype(data.dtype)
+    out = amp * (scaling_factor / maxamp).astype(amp.dtype, copy=False)
 
-    return newdata
\ No newline at end of file
+    self.set_proc(out)
+    # log
+    self.log("rdata.agcGain(window={}, scaling_factor={})".format(window, scaling_factor))
+    print("# automatic gain control applied with a window size of {} samples and scaling factor of {}".format(window, scaling_factor))
+
+    return
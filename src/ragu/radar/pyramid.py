@@ -0,0 +1,173 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+multi-resolution image pyramid for radargram display
+"""
+### imports ###
+import numpy as np
+import threading
+from collections import OrderedDict
+
+class pyramid(object):
+    """
+    pyramid holds max pooled copies of an (snum x tnum) or (snum x tnum x nchan) array for display.
+    level (i, j) pools blocks of 2**i samples by 2**j traces, so fast time and slow time are downsampled independently.
+    the block maximum is kept so thin bright reflectors are not aliased away - for dB data this is the block's peak power.
+    nan samples are ignored unless a whole block is nan.
+    levels other than full resolution are built on request in a background thread.
+    for display, windows of a level are further decimated along traces to screen resolution, keeping each pixel column's max.
+    """
+    def __init__(self, dat, minsize=64, cachesize=8):
+        #: np.ndarray, full resolution array
+        self.dat = dat
+        #: dict, built arrays keyed by level (i, j)
+        self.levels = {(0,0): dat}
+        #: tuple, coarsest level along samples and traces - no level is pooled below minsize
+        self.maxlevel = (self.nlevels(dat.shape[0], minsize), self.nlevels(dat.shape[1], minsize))
+        #: OrderedDict, recently decimated display windows
+        self.cache = OrderedDict()
+        #: int, number of decimated windows to cache
+        self.cachesize = cachesize
+        self.lock = threading.Lock()
+        self._want = None
+        self._worker = None
+
+
+    @staticmethod
+    def nlevels(n, minsize):
+        if n <= minsize:
+            return 0
+        return int(np.floor(np.log2(n / minsize)))
+
+
+    # clip level request to valid range
+    def clip(self, i, j):
+        return (int(min(max(i, 0), self.maxlevel[0])), int(min(max(j, 0), self.maxlevel[1])))
+
+
+    # get level (i, j) - if it is not yet built, queue it in the background and return the coarsest built level finer than it
+    # returns (key, arr), where arr samples are blocks of 2**key[0] samples by 2**key[1] traces
+    def get(self, i, j, block=False):
+        key = self.clip(i, j)
+        with self.lock:
+            if key in self.levels:
+                return key, self.levels[key]
+        if block:
+            self.build(key)
+            return key, self.levels[key]
+        self.request(key)
+        with self.lock:
+            src = self.source(key)
+            return src, self.levels[src]
+
+
+    # coarsest built level no coarser than key along either axis
+    def source(self, key):
+        ready = [k for k in self.levels if k[0] <= key[0] and k[1] <= key[1]]
+        return max(ready, key=lambda k: (k[0] + k[1], k[0]))
+
+
+    def ready(self, i, j):
+        return self.clip(i, j) in self.levels
+
+
+    # queue level for background build, starting the worker thread if idle
+    def request(self, key):
+        with self.lock:
+            self._want = key
+            if self._worker is None:
+                self._worker = threading.Thread(target=self.run, daemon=True)
+                self._worker.start()
+
+
+    # build requested levels until none are waiting
+    def run(self):
+        while True:
+            with self.lock:
+                key = self._want
+                self._want = None
+                if key is None:
+                    self._worker = None
+                    return
+                if key in self.levels:
+                    continue
+            self.build(key)
+
+
+    # build level from the closest finer built level
+    def build(self, key):
+        with self.lock:
+            if key in self.levels:
+                return
+            src = self.source(key)
+            arr = self.levels[src]
+        out = maxpool(arr, 2**(key[0] - src[0]), 2**(key[1] - src[1]))
+        with self.lock:
+            self.levels[key] = out
+
+
+    # get rows r0:r1 and columns c0:c1 of a built level (and channel chan for 3-D data), max pooled along columns into bins of b columns
+    # b is the number of level columns per screen pixel - windows are cached per zoom
+    def decimated(self, key, r0, r1, c0, c1, b, chan=None):
+        arr = self.levels[key][r0:r1, c0:c1]
+        if chan is not None:
+            arr = arr[:,:,chan]
+        if b <= 1:
+            return arr
+        ckey = (key, r0, r1, c0, c1, round(b, 6), chan)
+        with self.lock:
+            if ckey in self.cache:
+                self.cache.move_to_end(ckey)
+                return self.cache[ckey]
+        out = decimate(arr, b, c0)
+        with self.lock:
+            self.cache[ckey] = out
+            while len(self.cache) > self.cachesize:
+                self.cache.popitem(last=False)
+        return out
+
+
+# maxpool downsamples the first two axes of an array by taking the nan-ignoring max over fy x fx blocks
+def maxpool(arr, fy, fx):
+    """
+    INPUT:
+    arr         array to downsample, of shape (n, m) or (n, m, k)
+    fy          block size along axis 0
+    fx          block size along axis 1
+
+    OUTPUT:
+    out         array of shape (ceil(n/fy), ceil(m/fx)) or (ceil(n/fy), ceil(m/fx), k) - trailing blocks may be partial
+    """
+    out = arr
+    if fy > 1:
+        out = np.array(arr[0::fy])
+        for k in range(1, fy):
+            part = arr[k::fy]
+            np.fmax(out[:len(part)], part, out=out[:len(part)])
+    if fx > 1:
+        src = out
+        out = np.array(src[:,0::fx])
+        for k in range(1, fx):
+            part = src[:,k::fx]
+            np.fmax(out[:,:part.shape[1]], part, out=out[:,:part.shape[1]])
+    return out
+
+
+# decimate downsamples axis 1 of an array by taking the nan-ignoring max over bins of b columns
+def decimate(arr, b, c0=0):
+    """
+    INPUT:
+    arr         array to decimate, of shape (n, m) or (n, m, k)
+    b           float, bin width in columns
+    c0          int, column offset of arr in its parent array - bin edges fall on multiples of b in the parent, so they do not shift as a window pans
+
+    OUTPUT:
+    out         array of per-bin max, of shape (n, nbins) or (n, nbins, k)
+    """
+    m = arr.shape[1]
+    edges = np.floor(np.arange(np.floor(c0 / b), np.ceil((c0 + m) / b) + 1) * b).astype(int) - c0
+    edges = np.unique(np.clip(edges, 0, m))
+    return np.fmax.reduceat(arr, edges[edges < m], axis=1)
@@ -30,12 +30,10 @@ def pick_math(rdata, i_eps_r=3.15, amp_out=True, horizon=None, srf=None):
     # prep data amplitude array
     if (amp_out) and (rdata.dtype != "marsis"):
         # if raw data is complex, take absolute value to get amplitude
-        if np.iscomplex(rdata.dat).all():
-            damp = np.abs(rdata.dat)
-        elif np.iscomplexobj(rdata.dat):
-            damp = np.real(rdata.dat)
+        if rdata.is_complex():
+            damp = rdata.get_mag()
         else:
-            damp = rdata.dat
+            damp = rdata.get_real()
 
     # initilize output dataframe
     out = pd.DataFrame({"trace": trace, 
@@ -0,0 +1,181 @@
+# RAGU - Radar Analysis Graphical Utility
+#
+# copyright © 2020 btobers <tobers.brandon@gmail.com>
+#
+# distributed under terms of the GNU GPL3.0 license
+"""
+background task runner with progress reporting and cooperative cancellation
+"""
+### imports ###
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+# task running on the current thread
+_local = threading.local()
+
+#: int, default number of pmap threads - None for the cpu count
+threads = None
+
+# set_threads sets the default number of threads used by pmap in this process
+def set_threads(n=None):
+    global threads
+    threads = n
+    return
+
+
+class cancelled(Exception):
+    """Raised inside a task at its next checkpoint once it has been cancelled."""
+
+
+class task(object):
+    """
+    task holds the state of a function submitted to a runner - its progress, cancellation request and completion callbacks.
+    """
+    def __init__(self, label="", done=None, error=None):
+        #: str, task description for the status bar
+        self.label = label
+        #: function, called on the main thread with the task result once it completes
+        self.done = done
+        #: function, called on the main thread with the raised exception if the task fails
+        self.error = error
+        #: float, fraction complete as reported by checkpoint - None if unknown
+        self.progress = None
+        #: bool, set to request cancellation
+        self.cancelled = False
+        #: concurrent.futures.Future, pending result
+        self.future = None
+        self.start = time.time()
+
+
+    def run(self, func, args, kwargs):
+        _local.task = self
+        try:
+            checkpoint()
+            return func(*args, **kwargs)
+        finally:
+            _local.task = None
+
+
+    def cancel(self):
+        self.cancelled = True
+        self.future.cancel()
+
+
+# checkpoint reports progress of the task running on the current thread and raises cancelled if it has been cancelled - no-op outside of a task
+def checkpoint(progress=None):
+    t = getattr(_local, "task", None)
+    if t is None:
+        return
+    if progress is not None:
+        t.progress = progress
+    if t.cancelled:
+        raise cancelled(t.label)
+
+
+# pmap calls func on each item across a thread pool, returning results in order - workers defaults to the process thread setting
+# progress is reported to the calling task as items complete, and items not yet started are dropped if it is cancelled
+def pmap(func, items, workers=None):
+    items = list(items)
+    out = []
+    pool = ThreadPoolExecutor(max_workers=workers or threads or os.cpu_count())
+    futures = [pool.submit(func, item) for item in items]
+    try:
+        for future in futures:
+            out.append(future.result())
+            checkpoint(len(out) / len(items))
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
+    return out
+
+
+class runner(object):
+    """
+    runner executes tasks on a worker pool, keeping the tk event loop responsive.
+    tasks are polled from the event loop with after(), so completion callbacks run on the main thread.
+    progress of the oldest running task is shown on a status label. cancellation is cooperative -
+    a running task stops at its next checkpoint, leaving garlic processing state as it was before the step.
+    onbusy is called on the main thread with True when a task is submitted to an idle runner, and False once all tasks are applied.
+    """
+    def __init__(self, root, status=None, workers=1, interval=100, onbusy=None):
+        #: tk widget, used to schedule polling
+        self.root = root
+        #: tk.Label, status bar label
+        self.status = status
+        #: int, polling interval in ms
+        self.interval = interval
+        #: function, called with the busy state when it changes
+        self.onbusy = onbusy
+        #: list, submitted tasks in order
+        self.tasks = []
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self._after = None
+
+
+    # submit func(*args, **kwargs) to the worker pool
+    def submit(self, func, *args, label="", done=None, error=None, **kwargs):
+        t = task(label, done, error)
+        if (not self.tasks) and (self.onbusy is not None):
+            self.onbusy(True)
+        t.future = self.pool.submit(t.run, func, args, kwargs)
+        self.tasks.append(t)
+        if self._after is None:
+            self.poll()
+        return t
+
+
+    def busy(self):
+        return len(self.tasks) > 0
+
+
+    # request cancellation of all submitted tasks
+    def cancel(self):
+        for t in self.tasks:
+            t.cancel()
+
+
+    # apply finished tasks and update status, rescheduling while tasks remain
+    def poll(self):
+        self._after = None
+        for t in [t for t in self.tasks if t.future.done()]:
+            self.tasks.remove(t)
+            # a task which completed before seeing its cancellation has already been applied
+            if t.future.cancelled() or isinstance(t.future.exception(), cancelled):
+                print("# {} cancelled".format(t.label))
+                continue
+            err = t.future.exception()
+            if err is not None:
+                if t.error is not None:
+                    t.error(err)
+                else:
+                    print(err)
+            elif t.done is not None:
+                t.done(t.future.result())
+        self.show()
+        if self.tasks:
+            self._after = self.root.after(self.interval, self.poll)
+        elif self.onbusy is not None:
+            self.onbusy(False)
+
+
+    def show(self):
+        if self.status is None:
+            return
+        if not self.tasks:
+            self.status.config(text="")
+            return
+        t = self.tasks[0]
+        text = t.label
+        if t.progress is not None:
+            text += " {:.0f}%".format(t.progress*100)
+        text += " ({:.0f} s)".format(time.time() - t.start)
+        if t.cancelled:
+            text += " cancelling..."
+        self.status.config(text=text)
+
+
+    # cancel tasks and release the worker pool
+    def close(self):
+        self.cancel()
+        self.pool.shutdown(wait=False)
@@ -57,6 +57,23 @@ def delete_savedPicks(fpath):
         f.close()
 
 
+# read_lbl is a function to parse top-level KEY = VALUE pairs from a PDS label file
+def read_lbl(fpath):
+    out = {}
+    with open(fpath, "r", errors="ignore") as f:
+        for line in f:
+            if line.strip() == "END":
+                break
+            if "=" not in line:
+                continue
+            key, val = line.split("=", 1)
+            key = key.strip()
+            # only keep first occurence of key (ignore nested object definitions)
+            if key and key not in out:
+                out[key] = val.strip().strip('"')
+    return out
+
+
 # list_insert is a function to return the element at which to insert a new item to a sorted list
 def list_insert_idx(list, n): 
     # search for the position 
@@ -245,18 +262,75 @@ def powdB2amp(array):
     return np.power(10, (array / 20))
 
 
+# winpeak
+def winpeak(array, idx, windsize, cols=None, method="max", refine=False):
+    """
+    find a peak sample within a window around a sample index for each trace in a single vectorized pass
+    INPUT:
+    array       (snum x tnum) data array (e.g. magnitude or dB), nan samples are ignored
+    idx         (n,) window center sample per trace, nan entries are skipped
+    windsize    window size in samples - window spans int(idx - windsize/2) to int(idx + windsize/2)
+    cols        (n,) trace index per window center (default = arange(n))
+    method      "max" for the maximum value within the window, or "grad" for the first sample where
+                the absolute vertical gradient exceeds one standard deviation of the trace
+    refine      bool, refine "max" peaks to sub-sample position by fitting a parabola through the peak and its neighbors
+
+    OUTPUT:
+    out         (n,) peak sample per trace, nan where idx is nan or the window holds no valid samples
+    """
+    idx = np.asarray(idx, dtype=float)
+    cols = np.arange(len(idx)) if cols is None else np.asarray(cols, dtype=int)
+    out = np.repeat(np.nan, len(idx))
+    ok = ~np.isnan(idx)
+    if not ok.any():
+        return out
+    snum = array.shape[0]
+    start = (idx[ok] - (windsize/2)).astype(int)
+    end = (idx[ok] + (windsize/2)).astype(int)
+    # gather all windows at once, masking samples outside each window or the array
+    rows = start[:, np.newaxis] + np.arange(max(1, (end - start).max()))[np.newaxis, :]
+    valid = (rows < end[:, np.newaxis]) & (rows >= 0) & (rows < snum)
+    rows = np.clip(rows, 0, snum - 1)
+    c = cols[ok][:, np.newaxis]
+    if method == "grad":
+        # central difference vertical gradient over the gathered windows only, one-sided at the array edges as np.gradient
+        up = np.minimum(rows + 1, snum - 1)
+        dn = np.maximum(rows - 1, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grad = np.abs((array[up, c] - array[dn, c]) / (up - dn))
+        # standard deviation of only the traces holding a window
+        ucols, inv = np.unique(cols[ok], return_inverse=True)
+        std = np.nanstd(array[:, ucols], axis=0)[inv]
+        crit = (grad > std[:, np.newaxis]) & valid
+        pk = np.argmax(crit, axis=1)
+        found = valid.any(axis=1)
+    else:
+        win = np.where(valid, array[rows, c], np.nan)
+        found = ~np.all(np.isnan(win), axis=1)
+        win[~found] = 0
+        pk = np.nanargmax(np.where(np.isnan(win), -np.inf, win), axis=1)
+    res = (start + pk).astype(float)
+    if refine and method != "grad":
+        # parabolic interpolation through the peak and its in-window neighbors
+        n = np.arange(len(pk))
+        inner = (pk > 0) & (pk < rows.shape[1] - 1)
+        inner[inner] &= valid[n[inner], pk[inner] - 1] & valid[n[inner], pk[inner] + 1]
+        a = win[n[inner], pk[inner] - 1]
+        b = win[n[inner], pk[inner]]
+        d = win[n[inner], pk[inner] + 1]
+        denom = a - 2*b + d
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shift = np.where(denom != 0, 0.5*(a - d)/denom, 0)
+        res[inner] += np.nan_to_num(np.clip(shift, -0.5, 0.5))
+    res[~found] = np.nan
+    out[ok] = res
+    return out
+
+
 # pkampwind
 def pkampwind(array, idx, windsize):
-    # loop through array columns and find peak greater than 1  row idx within window of given idx
-    # use gradient to find maximum index where absolute value of derivative is greater than 1 sigma
-    out = np.repeat(np.nan, array.shape[1])
-    grad = np.gradient(array, axis = 1)
-    std = np.std(array, axis = 0)
-    for _i in range(array.shape[1]):
-        if np.isnan(idx[_i]):
-            continue
-        out[_i] = int(idx[_i] - (windsize/2)) + np.argmax(np.abs(grad[int(idx[_i] - (windsize/2)):int(idx[_i] + (windsize/2)), _i]) > std[_i])
-    return out
+    # find first sample within window of given idx where absolute value of vertical gradient is greater than 1 sigma
+    return winpeak(array, idx, windsize, method="grad")
 
 
 def print_pickInfo(data, trace, sample, eps_r=3.15):
@@ -13,7 +13,6 @@ import numpy as np
 import tkinter as tk
 import rasterio as rio
 import os, glob
-from pyproj import Transformer
 import matplotlib as mpl
 mpl.use("TkAgg")
 import matplotlib.pyplot as plt
@@ -184,7 +183,7 @@ class basemap(tk.Frame):
             return
 
         # transform navcrs to basemap crs
-        xformer = Transformer.from_crs(crs_from=self.navcrs, crs_to=self.bmcrs.to_wkt())
+        xformer = navparse.get_xformer(self.navcrs, self.bmcrs.to_wkt())
         x, y = xformer.transform(
             navdf["lon"].to_numpy(),
             navdf["lat"].to_numpy(),
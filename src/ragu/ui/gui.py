@@ -15,8 +15,10 @@ mainGUI class is a tkinter frame which runs the RAGU master GUI
 ### imports ###
 from ragu.raguError import raguError
 from ragu.ui import impick, wvpick, basemap, notepad
-from ragu.tools import utils, export
+from ragu.tools import utils, export, tasks
 from ragu.ingest import ingest
+from ragu.ingest import cache
+from ragu import radar
 import os, sys, scipy, glob, configparser, datetime, copy
 import numpy as np
 import pandas as pd
@@ -44,10 +46,27 @@ class mainGUI(tk.Frame):
             self.datPath = self.conf["path"]["datPath"]
         # initialize variables
         self.rdata = None
+        self.igst = None
+        self.igst_key = None
         self.f_loadName = ""
         self.map_loadName = ""
         self.tab = "Profile"
         self.eps_r = tk.DoubleVar(value=self.conf["output"]["eps_r"])
+        # set session floating point precision for processed data
+        try:
+            radar.set_precision(self.conf["param"]["precision"])
+        except:
+            pass
+        # persistent ingest cache directory
+        try:
+            self.cachePath = self.conf["path"]["cachePath"] or None
+        except:
+            self.cachePath = None
+        # background ingest of neighboring data files
+        try:
+            self.prefetch = cache.prefetcher(float(self.conf["param"]["prefetchMem"])*1e9, cachedir=self.cachePath)
+        except:
+            self.prefetch = cache.prefetcher(cachedir=self.cachePath)
         self.popup = popup(self.parent)
         self.proj = project()
         self.pick_vis = tk.BooleanVar()
@@ -201,7 +220,7 @@ class mainGUI(tk.Frame):
         procMenu.add_command(label="Flatten", command=lambda:self.procTools("flatten"))
         procMenu.add_command(label="Restack", command=lambda:self.procTools("restack"))
         procMenu.add_command(label="Vertical Data Roll", command=lambda:self.procTools("vroll"))
-        # procMenu.add_command(label="Dewow", command=lambda:self.procTools("dewow"))
+        procMenu.add_command(label="Dewow", command=lambda:self.procTools("dewow"))
 
         # processing submenu items
         gainMenu = tk.Menu(procMenu,tearoff=0)
@@ -212,7 +231,7 @@ class mainGUI(tk.Frame):
         procMenu.add_command(label="Hilbert Xform", command=lambda:self.procTools("hilbert"))
 
         # gain submenu items
-        # gainMenu.add_command(label="AGC", command=lambda:self.procTools("agc"))
+        gainMenu.add_command(label="AGC", command=lambda:self.procTools("agc"))
         gainMenu.add_command(label="T-Pow", command=lambda:self.procTools("tpow"))
         procMenu.add_cascade(label="Gain", menu=gainMenu)
 
@@ -272,6 +291,13 @@ class mainGUI(tk.Frame):
         infoFrame.pack(side="bottom",fill="x")
         self.rinfolbl = tk.Label(infoFrame)
         self.rinfolbl.pack(side="left")
+        # background task status and cancel button
+        button = tk.Button(infoFrame, text="Cancel", command=lambda:self.tasks.cancel())
+        button.pack(side="right")
+        button_tip(self.parent, button, "Cancel running data load or processing task")
+        self.statuslbl = tk.Label(infoFrame)
+        self.statuslbl.pack(side="right")
+        self.tasks = tasks.runner(self.parent, self.statuslbl, onbusy=self.set_busy)
 
         # handle x-button closing of window
         self.parent.protocol("WM_DELETE_WINDOW", self.close_window)
@@ -280,10 +306,19 @@ class mainGUI(tk.Frame):
         self.parent.bind("<Key>", self.key)
 
 
+    # set_busy is a method to lock picking and view updates while a background task is modifying the dataset
+    def set_busy(self, state=False):
+        self.impick.set_locked(state)
+        self.wvpick.set_locked(state)
+
+
     # key is a method to handle UI keypress events
     def key(self,event):
         state = event.state
         key = event.keysym
+        # only allow closing ragu while a background task is running
+        if self.tasks.busy() and not (state & 4 and key == "q"):
+            return
         # event.state & 4 True for Ctrl+Key
         # event.state & 1 True for Shift+Key
         # general keps for either tab
@@ -410,8 +445,12 @@ class mainGUI(tk.Frame):
         # check if picks have been made and saved
         if self.save_check() == False:
             if tk.messagebox.askokcancel("Warning", "Exit RAGU without saving picks?", icon = "warning") == True:
+                self.tasks.close()
+                self.prefetch.close()
                 self.parent.destroy()
         else:
+            self.tasks.close()
+            self.prefetch.close()
             self.parent.destroy()
 
 
@@ -491,10 +530,12 @@ class mainGUI(tk.Frame):
 
     # open_dat loads the data file and passes to other modules
     def open_dfile(self, f_loadName=None, switch=False, direction="Right"):
-            # if input selected, clear impick canvas, ingest data and pass to impick
+            # if input selected, ingest data in the background and pass to impick once loaded
             try:
-            # for fuck in ['bananas']:
                 if f_loadName:
+                    if self.tasks.busy():
+                        print("Please wait for the current task to finish, or cancel it")
+                        return
                     # switch to profile tab
                     if self.tab == "Waveform":
                         self.nb.select(self.nb.tabs()[0])
@@ -502,14 +543,42 @@ class mainGUI(tk.Frame):
                     # update and save project file
                     self.proj.update_paths(self.f_loadName, self.map_loadName, self.notepad._notepad__get_file())
                     self.proj.save()
-                    # ingest the data
-                    self.igst = ingest(self.f_loadName)
-                    self.rdata = self.igst.read(self.conf["path"]["simPath"], self.conf["nav"]["crs"], self.conf["nav"]["body"])
+                    # ingest the data - use recently opened or prefetched dataset if available
+                    k = cache.key(self.f_loadName, self.conf["path"]["simPath"], self.conf["nav"]["crs"], self.conf["nav"]["body"])
+                    def read():
+                        igst = self.prefetch.get(k)
+                        if igst is None:
+                            igst = ingest(f_loadName)
+                            igst.read(self.conf["path"]["simPath"], self.conf["nav"]["crs"], self.conf["nav"]["body"], cachedir=self.cachePath)
+                        return igst
+                    self.tasks.submit(read, label="Loading " + os.path.basename(f_loadName),
+                                      done=lambda igst: self.load_dfile(igst, k, switch, direction),
+                                      error=lambda err: self.open_error(err, switch, direction))
+                else:
+                    self.load_dfile(switch=switch, direction=direction)
+
+            except Exception as err:
+                self.open_error(err, switch, direction)
+
+
+    # load_dfile passes ingested data to impick, wvpick, basemap and notepad
+    def load_dfile(self, igst=None, k=None, switch=False, direction="Right"):
+            try:
+                if igst is not None:
+                    # hold the dataset being left, with its processing state and picks
+                    if k != self.igst_key:
+                        self.prefetch.put(self.igst_key, self.igst)
+                    self.igst, self.igst_key = igst, k
+                    self.rdata = self.igst.rdata
                     try:
                         self.rdata.asep =  float(self.conf["output"]["asep"])
                         self.rdata.info["Antenna Separation [m]"] = self.rdata.asep
                     except:
                         pass
+                    try:
+                        self.rdata.journal.membudget = float(self.conf["param"]["undoMem"])*1e9
+                    except:
+                        pass
                     self.impick.clear_canvas()  
                     self.impick.set_vars()
                     self.impick.load(self.rdata)
@@ -545,15 +614,24 @@ class mainGUI(tk.Frame):
                 if (os.path.isfile(tmpf)) and (tk.messagebox.askyesno("Load Picks", "Load pick file: {}?".format(tmpf), icon = "question") == True):
                     self.import_pick(tmpf)
 
+                # ingest neighboring files in the background while the user picks
+                if igst is not None:
+                    self.prefetch_dfiles()
+
 
             # recall choose_dfile if wrong file type is selected 
             except Exception as err:
-                # if switch, just advance to next file
-                if switch:
-                    self.switch_dfile(direction)
-                else:
-                    print(err)
-                    self.choose_dfile() 
+                self.open_error(err, switch, direction)
+
+
+    # open_error is a method to handle a data file which failed to load
+    def open_error(self, err, switch=False, direction="Right"):
+        # if switch, just advance to next file
+        if switch:
+            self.switch_dfile(direction)
+        else:
+            print(err)
+            self.choose_dfile() 
 
 
     # switch_dfile is a method to get the filename of the last/next data file in the directory to open
@@ -570,7 +648,7 @@ class mainGUI(tk.Frame):
             file_path = os.path.dirname(self.f_loadName)
 
             # get index of crurrently displayed file in directory
-            file_list = [file_path + "/" + f for f in sorted(os.listdir(file_path)) if f.endswith(self.igst.ftype) or f.endswith(self.igst.ftype.upper())]
+            file_list = self.get_dfiles()
             file_index = file_list.index(self.f_loadName)
 
             if direction=="Right":
@@ -596,37 +674,53 @@ class mainGUI(tk.Frame):
                     print("Note: " + self.f_loadName.split("/")[-1] + " is the first file in " + file_path + "/*." + self.f_loadName.split(".")[-1])
     
 
+    # get_dfiles is a method to get the sorted list of data files in the directory of the current data file, of the same file type
+    def get_dfiles(self):
+        file_path = os.path.dirname(self.f_loadName)
+        return [file_path + "/" + f for f in sorted(os.listdir(file_path)) if f.endswith(self.igst.ftype) or f.endswith(self.igst.ftype.upper())]
+
+
+    # prefetch_dfiles is a method to queue background ingest of the files before and after the current data file
+    def prefetch_dfiles(self):
+        file_list = self.get_dfiles()
+        if self.f_loadName not in file_list:
+            return
+        file_index = file_list.index(self.f_loadName)
+        self.prefetch.prefetch([file_list[i] for i in (file_index + 1, file_index - 1) if 0 <= i < len(file_list)],
+                                self.conf["path"]["simPath"], self.conf["nav"]["crs"], self.conf["nav"]["body"])
+
+
     # generate new interpretation horizon
     def new_horizon(self):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             self.impick.init_horizon()
 
 
     # generate new interpretation segment for specified horizon
     def new_segment(self):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             self.impick.init_segment()
 
 
     # start impick picking functionality
     def start_pick(self):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             self.impick.set_pickState(True)
 
 
     # end impick picking functionality
     def end_pick(self):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             self.impick.set_pickState(False)
 
 
     def edit_pick(self):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             self.impick.edit_segment()
 
 
     def clear_pick(self, hFlag=None, segFlag=None, allFlag=None):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             if hFlag:
                 self.impick.rm_horizon()
             if segFlag:
@@ -637,7 +731,7 @@ class mainGUI(tk.Frame):
     
     # import_pick is a method to load and plot picks saved to a csv file
     def import_pick(self, path=None):
-        if self.f_loadName:
+        if self.f_loadName and not self.tasks.busy():
             if path:
                 if os.path.isfile(path):
                     pk_file = path
@@ -700,7 +794,7 @@ class mainGUI(tk.Frame):
         elif not tk.messagebox.askyesno("Warning","Surface horizon already exists. Overwrite with auto-pick surface?"):
             return
 
-        self.rdata.pick.horizons[srf] = utils.get_srf(np.abs(self.rdata.dat), self.rdata.info["Signal Type"])
+        self.rdata.pick.horizons[srf] = utils.get_srf(self.rdata.get_mag(), self.rdata.info["Signal Type"])
         self.srf_define(srf=srf)
         self.impick.set_picks(horizon=srf)
         self.impick.blit()
@@ -734,6 +828,9 @@ class mainGUI(tk.Frame):
     # export_pick is method to receieve the desired pick save location from user input
     def export_pick(self, flag=None):
         if self.f_loadName:
+            if self.tasks.busy():
+                print("Please wait for the current task to finish, or cancel it")
+                return
             # see if any picks have been made
             if  self.rdata.pick.get_pick_flag():
                 # get directory path to save data
@@ -794,35 +891,40 @@ class mainGUI(tk.Frame):
                         self.rdata.set_srfElev()
     
                 # export single or merged horizons
+                exports = []
                 if flag is None or flag=="merged":
                     # ensure surface horizon is defined
                     self.srf_define()
-                    # set output dataframe
-                    self.rdata.set_out(export.pick_math(self.rdata, self.eps_r.get(), self.conf["output"]["amp"], horizon=horizon, srf=self.rdata.pick.get_srf()))
-                    if self.conf["output"].getboolean("csv"):
-                        export.csv(fn_out + ".csv", self.rdata.out)
-                    if self.conf["output"].getboolean("gpkg"):
-                        export.gpkg(fn_out + ".gpkg", self.rdata.out, self.conf["nav"]["crs"])
-
+                    exports.append((horizon, fn_out))
 
                 # if flag is all, export all horizons individually
                 elif flag == "all":
                     for h in horizons:
-                        fn_out = dir_out + "/" + self.rdata.fn + "_" + h + "_pk_" + self.conf["param"]["uid"]
-                        # export picks for each horizon
-                        self.rdata.set_out(export.pick_math(self.rdata, self.eps_r.get(), self.conf["output"]["amp"], horizon=h, srf=self.rdata.pick.get_srf()))
+                        exports.append((h, dir_out + "/" + self.rdata.fn + "_" + h + "_pk_" + self.conf["param"]["uid"]))
+                    fn_out = dir_out + "/" + self.rdata.fn + "_pk_" + self.conf["param"]["uid"]
+
+                # compute and write pick outputs in the background - tk variables are read here on the main thread
+                eps_r = self.eps_r.get()
+                def write():
+                    for i, (h, fn) in enumerate(exports):
+                        # set output dataframe
+                        self.rdata.set_out(export.pick_math(self.rdata, eps_r, self.conf["output"]["amp"], horizon=h, srf=self.rdata.pick.get_srf()))
                         if self.conf["output"].getboolean("csv"):
-                            export.csv(fn_out + ".csv", self.rdata.out)
+                            export.csv(fn + ".csv", self.rdata.out)
                         if self.conf["output"].getboolean("gpkg"):
-                            export.gpkg(fn_out + ".gpkg", self.rdata.out, self.conf["nav"]["crs"])
-                        fn_out = dir_out + "/" + self.rdata.fn + "_pk_" + self.conf["param"]["uid"]
-                        
+                            export.gpkg(fn + ".gpkg", self.rdata.out, self.conf["nav"]["crs"])
+                        tasks.checkpoint((i + 1) / len(exports))
+
+                self.tasks.submit(write, label="Exporting picks", done=lambda res: self.export_done(fn_out))
 
-                if self.conf["output"].getboolean("fig"):
-                    self.impick.export_fig(fn_out + ".png")
-                # export project if projpath exists
-                if self.proj.get_projPath():
-                    self.export_proj()
+
+    # export_done is a method to export the pick figure and project once pick outputs are written
+    def export_done(self, fn_out):
+        if self.conf["output"].getboolean("fig"):
+            self.impick.export_fig(fn_out + ".png")
+        # export project if projpath exists
+        if self.proj.get_projPath():
+            self.export_proj()
 
 
     # export_dat is a method to save processed radar data
@@ -966,6 +1068,9 @@ class mainGUI(tk.Frame):
         # don't do anything unless different tab selected
         if (tmp != self.tab) and (self.rdata):
             self.tab = tmp
+            # picks are updated once the running task completes
+            if self.tasks.busy():
+                return
             # determine which tab is active
             if (self.tab == "Waveform"):
                 self.end_pick()
@@ -988,78 +1093,44 @@ class mainGUI(tk.Frame):
     # processing tools
     def procTools(self, arg = None):
         if self.f_loadName:
-            procFlag = None
+            if self.tasks.busy():
+                print("Please wait for the current task to finish, or cancel it")
+                return
+            # processing step to run in the background, and display update to apply once it completes
+            step = None
+            after = None
             simFlag = None
             if arg == "reverse":
-                self.rdata.reverse()
-                self.impick.reverse()
-                procFlag = True
+                step = self.rdata.reverse
+                after = self.impick.reverse
 
             elif arg == "tzero":
                 # set tzero should only be used for ground-based GPR data
-                self.rdata.set_tzero()
-                if self.rdata.flags.sampzero > 0:
-                    srf = self.rdata.pick.get_srf()
-                    if srf is None:
-                        srf = "srf"
-
-                    # define surface horizon name to set index to zeros
-                    self.rdata.pick.horizons[srf] = np.zeros(self.rdata.tnum)
-                    self.srf_define(srf=srf)
-
-                    # apply sample shift to existing horizons and update picks
-                    for h in self.rdata.pick.horizons:
-                        if h != srf:
-                            self.rdata.pick.horizons[h] -= self.rdata.flags.sampzero
-                    
-                    # clear horizons from canvas and redraw shifted horizons
-                    tmp = copy.deepcopy(self.rdata.pick.horizons)
-                    self.impick.rm_horizon(rm_all=True, verify=False)
-                    for h in tmp.keys():
-                        self.rdata.pick.horizons[h] = tmp[h]
-                        self.impick.set_picks(h)
-
-                    self.impick.blit()
-                    procFlag = True
+                step = self.rdata.set_tzero
+                after = self.tzero_picks
 
             elif arg == "flatten":
                 # if a surface is defined and data isn't already time-zero shifted, flatten
-
                 if (self.rdata.pick.get_srf()) and (self.rdata.flags.sampzero == 0):
-                    self.rdata.flatten()
-
-                    # apply sample shift to existing horizons and update picks
-                    # first copy horizons and remove them from impick cancas
-                    tmp = copy.deepcopy(self.rdata.pick.horizons)
-                    self.impick.rm_horizon(rm_all=True, verify=False)
-                    for h in tmp:
-                        self.rdata.pick.horizons[h] = tmp[h] - self.rdata.flags.sampzero
-                        self.impick.set_picks(horizon=h)
-
-                    self.impick.blit()
-                    procFlag = True
+                    step = self.rdata.flatten
+                    after = self.flatten_picks
 
             elif arg == "vroll":
                 samples = tk.simpledialog.askinteger("input","number of samples to roll data array")
-                self.rdata.vertical_roll(samples)
-                procFlag = True
+                step = lambda: self.rdata.vertical_roll(samples)
 
             elif arg == "restack":
                 thold = tk.simpledialog.askfloat("input","GPS drift threshold between consecutive traces (m)", initialvalue=0.5)
                 dist = tk.simpledialog.askfloat("input","restacking distance (m)", initialvalue=0)
-                self.rdata.restack(dist, thold)
-                procFlag = True
+                step = lambda: self.rdata.restack(dist, thold)
 
             elif arg == "dewow":
-                print("dewow currently in development")
-                # window = tk.simpledialog.askfloat("input","dewow window size (# samples/" +  str(int(self.rdata.snum)) + ")?")
-                # proc = processing.dewow(self.rdata.dat, window=10)
-                # procFlag = True
+                window = tk.simpledialog.askinteger("input","dewow window size (# samples/" +  str(int(self.rdata.snum)) + ")?")
+                if window:
+                    step = lambda: self.rdata.dewow(window=window)
 
             elif arg == "hilbert":
-                print("hilbert transform currently in development")
-                # self.rdata.hilbertxform()
-                # procFlag = True
+                step = self.rdata.hilbertxform
 
             elif arg == "filter":
                 if self.popup.flag == 1:
@@ -1153,54 +1224,98 @@ class mainGUI(tk.Frame):
                         highcut = None
                     if lowcut is None and highcut is None:
                         raise ValueError("Filter error: no lowcut or highcut frequencies specified.")
-                    self.rdata.filter(btype=btype.get(), lowcut=lowcut, highcut=highcut, order=order.get(), direction=direction.get())
-                    procFlag = True
+                    filtargs = dict(btype=btype.get(), lowcut=lowcut, highcut=highcut, order=order.get(), direction=direction.get())
+                    step = lambda: self.rdata.filter(**filtargs)
                 except Exception as err:
                     print(err)
 
             elif arg == "tpow":
                 power = tk.simpledialog.askfloat("Input","Power for tpow gain?")
-                self.rdata.tpowGain(power=power)
-                procFlag = True
+                step = lambda: self.rdata.tpowGain(power=power)
 
             elif arg == "remSlidingMean":
                 window = tk.simpledialog.askinteger("Input","Window size for background removal (Number of Samples)?")
                 if window <= self.rdata.tnum:
-                    self.rdata.removeSlidingMeanFFT(window=window)
-                    procFlag = True
+                    step = lambda: self.rdata.removeSlidingMeanFFT(window=window)
                 else:
                     raise raguError("Window size must not exceed the number of traces.")
 
 
             elif arg == "agc":
-                print("automatic gain control currently in development")
-                # window = tk.simpledialog.askfloat("input","AGC gain window size (# samples/" +  str(int(self.rdata.snum)) + ")?")
-                # proc = processing.agcGain(self.rdata.dat, window=window)
-                # procFlag = True
+                window = tk.simpledialog.askinteger("input","AGC gain window size (# samples/" +  str(int(self.rdata.snum)) + ")?", initialvalue=50)
+                scaling_factor = tk.simpledialog.askfloat("input","AGC scaling factor?", initialvalue=50)
+                if window and scaling_factor:
+                    step = lambda: self.rdata.agcGain(window=window, scaling_factor=scaling_factor)
 
             elif arg == "undo":
-                self.rdata.undo()
-                procFlag = True
+                step = self.rdata.undo
+                # redraw horizons - they are flipped if the undone step reversed the radargram
+                after = self.impick.reverse
 
             elif arg == "redo":
-                self.rdata.redo()
-                procFlag = True
+                step = self.rdata.redo
+                after = self.impick.reverse
 
             elif arg == "reset":
                 # reset origianl rdata
-                self.rdata.reset()
-                procFlag = True
+                step = self.rdata.reset
 
             else:
                 print("undefined processing method")
                 exit(1)
 
-            if procFlag:
-                self.impick.set_crange()
-                self.impick.drawData(force=True)
-                self.wvpick.clear()
-                self.wvpick.set_vars()
-                self.wvpick.set_data(self.rdata)
+            if step is not None:
+                self.tasks.submit(step, label="Processing: " + arg, done=lambda res: self.proc_done(after))
+
+
+    # proc_done is a method to update the display once a processing step completes
+    def proc_done(self, after=None):
+        if after is not None:
+            after()
+        self.impick.set_crange()
+        self.impick.drawData(force=True)
+        self.wvpick.clear()
+        self.wvpick.set_vars()
+        self.wvpick.set_data(self.rdata)
+
+
+    # tzero_picks is a method to set the surface horizon and shift existing horizons after a time zero shift
+    def tzero_picks(self):
+        if self.rdata.flags.sampzero > 0:
+            srf = self.rdata.pick.get_srf()
+            if srf is None:
+                srf = "srf"
+
+            # define surface horizon name to set index to zeros
+            self.rdata.pick.horizons[srf] = np.zeros(self.rdata.tnum)
+            self.srf_define(srf=srf)
+
+            # apply sample shift to existing horizons and update picks
+            for h in self.rdata.pick.horizons:
+                if h != srf:
+                    self.rdata.pick.horizons[h] -= self.rdata.flags.sampzero
+
+            # clear horizons from canvas and redraw shifted horizons
+            tmp = copy.deepcopy(self.rdata.pick.horizons)
+            self.impick.rm_horizon(rm_all=True, verify=False)
+            for h in tmp.keys():
+                self.rdata.pick.horizons[h] = tmp[h]
+                self.impick.set_picks(h)
+
+            self.impick.blit()
+
+
+    # flatten_picks is a method to shift existing horizons after flattening
+    def flatten_picks(self):
+        # apply sample shift to existing horizons and update picks
+        # first copy horizons and remove them from impick cancas
+        tmp = copy.deepcopy(self.rdata.pick.horizons)
+        self.impick.rm_horizon(rm_all=True, verify=False)
+        for h in tmp:
+            self.rdata.pick.horizons[h] = tmp[h] - self.rdata.flags.sampzero
+            self.impick.set_picks(horizon=h)
+
+        self.impick.blit()
 
 
     def settings(self):
@@ -38,6 +38,8 @@ class impick(tk.Frame):
         self.horVar = tk.StringVar()
         self.segVar = tk.IntVar()
         self.color = tk.StringVar()
+        #: bool, ignore picking and view updates while a background task is modifying the dataset
+        self.locked = False
         self.setup(fs)
 
 
@@ -200,7 +202,7 @@ class impick(tk.Frame):
         self.click = self.fig.canvas.mpl_connect("button_press_event", self.onpress)
         self.unclick = self.fig.canvas.mpl_connect("button_release_event", self.onrelease)
         self.draw_cid = self.fig.canvas.mpl_connect("draw_event", self.update_bg)
-        self.resize_cid = self.fig.canvas.mpl_connect("resize_event", self.drawData)
+        self.resize_cid = self.fig.canvas.mpl_connect("resize_event", self.view_changed)
         self.mousemotion = self.fig.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
 
         # set custom mpl line colors - cyan, green, orange, magenta, yellow, blue, purple, brown
@@ -219,6 +221,9 @@ class impick(tk.Frame):
 
         self.pick_state = False
         self.pyramid = None
+        self.pyramid_wait = False
+        self.view = None
+        self.view_tpp = None
 
         # image colormap bounds
         self.data_cmin = None
@@ -284,6 +289,9 @@ class impick(tk.Frame):
         self.im_sim  = self.ax.imshow(np.ones((100,100)), aspect="auto", 
                         extent=[0, self.rdata.tnum, self.rdata.snum, 0])
 
+        # axes limits are set explicitly - keep image extent updates from rescaling the view
+        self.ax.set_autoscale_on(False)
+
         # set clutter sim visibility to false
         self.im_sim.set_visible(False)
         # disable im toggle if no sim
@@ -300,8 +308,9 @@ class impick(tk.Frame):
         # update the canvas
         self.dataCanvas._tkcanvas.pack()
 
-        # connect ylim_change with event to update image pyramiding based on zoom - have to do this on load, since clear_canvas removes axis callbacks
-        self.ylim_cid = self.ax.callbacks.connect("ylim_changed", self.drawData)
+        # connect xlim_change and ylim_change with event to update image pyramiding and viewport based on zoom and pan - have to do this on load, since clear_canvas removes axis callbacks
+        self.xlim_cid = self.ax.callbacks.connect("xlim_changed", self.view_changed)
+        self.ylim_cid = self.ax.callbacks.connect("ylim_changed", self.view_changed)
 
         # update toolbar to save axes extents
         self.toolbar.update()
@@ -390,40 +399,94 @@ class impick(tk.Frame):
 
 
     # method to draw radar data
-    def drawData(self, force=False, event=None):
-        # Get data display window size in inches
-        w,h = self.fig.get_size_inches()*self.fig.dpi
-        # choose pyramid
-        p = -1
-        for i in range(len(self.rdata.dPyramid)-1, -1, -1):
-            if(self.rdata.dPyramid[i].shape[0] > h):
-                p = i
-                break
+    def drawData(self, force=False, redraw=True):
+        # get axes display size in pixels
+        bbox = self.ax.get_window_extent()
+        w, h = max(bbox.width, 1), max(bbox.height, 1)
+        # get visible trace and sample window
+        x0, x1 = np.clip(sorted(self.ax.get_xlim()), 0, self.rdata.tnum)
+        y0, y1 = np.clip(sorted(self.ax.get_ylim()), 0, self.rdata.snum)
+        xspan = max(x1 - x0, 1)
+        yspan = max(y1 - y0, 1)
+        # choose pyramid level - coarsest level with at least one sample per screen pixel along each axis
+        i = int(np.floor(np.log2(max(yspan / h, 1))))
+        j = int(np.floor(np.log2(max(xspan / w, 1))))
 
         # set flag to detect if canvas needs redrawing
         flag = False
 
-        # if ideal pyramid level changed, update image
-        if self.pyramid != p or force:
-            self.pyramid = p
-            if len(self.rdata.dPyramid[self.pyramid].shape) == 3:
-                self.im_dat.set_data(self.rdata.dPyramid[self.pyramid][:,:,self.chan.get()])
-            else:
-                self.im_dat.set_data(self.rdata.dPyramid[self.pyramid][:,:])
+        # only the visible window plus a margin of half the view on each side is rendered -
+        # re-slice if the pyramid level changed, the view left the rendered window, or the rendered window is much larger than the view
+        dPyramid = self.rdata.dPyramid
+        key, arr = dPyramid.get(i, j)
+        # traces per screen pixel
+        tpp = xspan / w
+        view = self.view
+        if (self.pyramid != (dPyramid, key)) or force or (view is None) or (tpp != self.view_tpp) or \
+            (x0 < view[0]) or (x1 > view[1]) or (y0 < view[2]) or (y1 > view[3]) or \
+            ((view[3] - view[2]) > 4*yspan):
+            self.pyramid = (dPyramid, key)
+            self.view_tpp = tpp
+            window = [x0 - xspan/2, x1 + xspan/2, y0 - yspan/2, y1 + yspan/2]
+            chan = self.chan.get() if len(arr.shape) == 3 else None
+            self.view = self.set_image(self.im_dat, dPyramid, key, window, tpp, chan)
             if self.rdata.flags.sim:
-                self.im_sim.set_data(self.rdata.sPyramid[self.pyramid][:,:])
+                skey, sarr = self.rdata.sPyramid.get(*key)
+                self.set_image(self.im_sim, self.rdata.sPyramid, skey, window, tpp)
             flag = True
 
+        # requested level is being built in the background - check back once it is ready
+        if (key != dPyramid.clip(i, j)) and not self.pyramid_wait:
+            self.pyramid_wait = True
+            self.dataCanvas.get_tk_widget().after(100, self.pyramid_ready)
+
         # update cmap if necessary
         if self.im_dat.get_cmap().name != self.cmap.name:
             self.im_dat.set_cmap(self.cmap)
             self.im_sim.set_cmap(self.cmap)
             flag = True
 
-        if flag:
+        if flag and redraw:
             self.dataCanvas.draw()
 
 
+    # set image data to the pyramid level blocks covering window [x0, x1, y0, y1], with extent in full resolution trace/sample coordinates
+    # columns are decimated to tpp traces per screen pixel, keeping the peak of each pixel column so narrow features do not flicker with zoom
+    # returns the rendered window, clipped to the data bounds
+    def set_image(self, im, pyr, key, window, tpp, chan=None):
+        fy, fx = 2**key[0], 2**key[1]
+        shape = pyr.levels[key].shape
+        r0 = int(np.clip(np.floor(window[2] / fy), 0, shape[0] - 1))
+        r1 = int(np.clip(np.ceil(window[3] / fy), r0 + 1, shape[0]))
+        c0 = int(np.clip(np.floor(window[0] / fx), 0, shape[1] - 1))
+        c1 = int(np.clip(np.ceil(window[1] / fx), c0 + 1, shape[1]))
+        im.set_data(pyr.decimated(key, r0, r1, c0, c1, tpp / fx, chan))
+        im.set_extent([c0*fx, c1*fx, r1*fy, r0*fy])
+        return [c0*fx, min(c1*fx, self.rdata.tnum), r0*fy, min(r1*fy, self.rdata.snum)]
+
+
+    # re-slice displayed image when the axes limits or size change - the canvas is redrawn by whatever changed them
+    def view_changed(self, event=None):
+        if self.locked:
+            return
+        self.drawData(redraw=False)
+
+
+    # redraw once background pyramid level is ready
+    def pyramid_ready(self):
+        self.pyramid_wait = False
+        if self.locked:
+            return
+        self.drawData()
+
+
+    # lock picking and view updates while a background task modifies the dataset, catching up on the view once unlocked
+    def set_locked(self, state=False):
+        self.locked = state
+        if (not state) and self.rdata:
+            self.drawData()
+
+
     # set axis labels
     def set_axes(self):
         # update twtt and depth (subradar dist.)
@@ -1260,10 +1323,10 @@ class impick(tk.Frame):
             # generate array between first and last pick indices on current layer
             picked_traces = np.arange(self.tmp_horizon_path.x[0], self.tmp_horizon_path.x[-1] + 1)
             sample = cs(picked_traces).astype(int)
-            # if windize >=2, loop over segment and take maximum sample within window of cubic spline interp
+            # if windize >=2, take maximum sample within window of cubic spline interp for each trace
             if winSize >= 2:
-                for _i in range(len(picked_traces)):
-                    sample[_i] = int(sample[_i] - (winSize/2)) + np.argmax(np.abs(self.rdata.dat)[int(sample[_i] - (winSize/2)):int(sample[_i] + (winSize/2)), picked_traces[_i]])
+                pk = utils.winpeak(self.rdata.get_mag(), sample, winSize, cols=picked_traces)
+                sample = np.where(np.isnan(pk), sample, pk).astype(int)
             # add pick interpolation to horizon objects for current segment
             self.horizon_paths[horizon][seg].x[picked_traces] = picked_traces
             self.horizon_paths[horizon][seg].y[picked_traces] = sample
@@ -1451,6 +1514,8 @@ class impick(tk.Frame):
     # onrelease calls addseg() if the time between the button press and release events
     # is below a threshold so that segments are not drawn while trying to zoom or pan
     def onrelease(self,event):
+        if self.locked:
+            return
         if event.inaxes == self.ax:
             if event.button == 1 and ((time.time() - self.time_onclick) < 0.25):
                 self.addseg(event)
@@ -36,6 +36,8 @@ class wvpick(tk.Frame):
         self.color = tk.StringVar()
         self.interp_type = tk.StringVar()
         self.interp_type.set("cubic")
+        #: bool, ignore repicking and waveform updates while a background task is modifying the dataset
+        self.locked = False
         self.setup()
 
     def setup(self):
@@ -179,6 +181,11 @@ class wvpick(tk.Frame):
         self.rdata = rdata
 
 
+    # lock repicking and waveform updates while a background task modifies the dataset
+    def set_locked(self, state=False):
+        self.locked = state
+
+
     # receive horizon paths from impick
     def set_horizon_paths(self, horizon_paths):
         self.horizon_paths = copy.deepcopy(horizon_paths)
@@ -234,6 +241,8 @@ class wvpick(tk.Frame):
 
     # plot_wv is a method to draw the waveform on the datacanvas
     def plot_wv(self, *args):
+        if self.locked:
+            return
         horizon = self.horVar.get()
         seg = self.segVar.get()
         winSize = self.winSize.get()
@@ -286,6 +295,8 @@ class wvpick(tk.Frame):
 
     # full extent for trace
     def fullExtent(self):
+        if self.locked:
+            return
         horizon = self.horVar.get()
         self.ax.set_xlim(0, self.rdata.snum)
         self.ax.set_ylim(self.rdata.proc.curr_dB[:,self.trace[horizon]].min(), self.rdata.proc.curr_dB[:,self.trace[horizon]].max())
@@ -294,6 +305,8 @@ class wvpick(tk.Frame):
 
     # stepBackward is a method to move backwards by the number of traces entered to stepSize
     def stepBackward(self):
+        if self.locked:
+            return
         horizon = self.horVar.get()
         seg = self.segVar.get()
         step = self.stepSize.get()
@@ -322,6 +335,8 @@ class wvpick(tk.Frame):
 
     # stepForward is a method to move forward by the number of traces entered to stepSize
     def stepForward(self):
+        if self.locked:
+            return
         horizon = self.horVar.get()
         seg = self.segVar.get()
         step = self.stepSize.get()
@@ -386,23 +401,24 @@ class wvpick(tk.Frame):
 
     # auto_repick is a method to automatically optimize subsurface picks by selecting the maximul amplitude sample within the specified window around existing picks
     def auto_repick(self):
+        if self.locked:
+            return
         if self.nhorizons > 0:
             horizon = self.horVar.get()
             seg = self.segVar.get()
             winSize = self.winSize.get()
             x = np.arange(self.segment_traces[horizon].first[seg], self.segment_traces[horizon].last[seg] + 1)
             y = self.horizon_paths[horizon][seg].y[x]
-            for _i in range(len(x)):
-                if not np.isnan(y[_i]):
-                    # find argmax for window for given data trace in pick
-                    max_idx = np.nanargmax(self.rdata.proc.curr_dB[int(y[_i] - (winSize/2)):int(y[_i] + (winSize/2)), x[_i]])
-                    # add argmax index to pick_dict1 - account for window index shift
-                    self.horizon_paths_opt[horizon][seg].y[x[_i]] = max_idx + int(y[_i] - (winSize/2))
+            # find argmax within window for each picked trace
+            pk = utils.winpeak(self.rdata.proc.curr_dB, y, winSize, cols=x)
+            self.horizon_paths_opt[horizon][seg].y[x[~np.isnan(pk)]] = pk[~np.isnan(pk)]
             self.plot_wv()
 
 
     # manual_repick is a method to manually adjust existing picks by clicking along the displayed waveform
     def manual_repick(self, event):
+        if self.locked:
+            return
         if (not self.nhorizons > 0) or (event.inaxes != self.ax):
             return
         horizon = self.horVar.get()
@@ -417,6 +433,8 @@ class wvpick(tk.Frame):
 
     # interp_repick is a method to interpolate between manually refined subsurface picks
     def interp_repick(self):
+        if self.locked:
+            return
         horizon = self.horVar.get()
         seg = self.segVar.get()
         interp = self.interp_type.get()
@@ -515,7 +533,7 @@ class wvpick(tk.Frame):
 
     # on_mouse_move blit crosshairs
     def on_mouse_move(self, event):
-        if self.rdata is None:
+        if (self.rdata is None) or self.locked:
             return
         x = event.xdata
         y = event.ydata